@@ -1,7 +1,103 @@
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.http import FileResponse
+from django.urls import set_script_prefix
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """
+    Serve every request from start to finish on one thread of a bounded
+    pool, while the event loop only reads request bodies and writes
+    responses.
+
+    Django's own handler runs all synchronous views on a single shared
+    thread, so one slow query holds up the whole process. Here up to
+    ASGI_THREADS views run at once, each keeping its database connection
+    on its own thread, and streamed responses are iterated off the loop.
+    """
+    def __init__(self):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS,
+            thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await super().__call__(scope, receive, send)
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            self.executor, self.handle, scope, body_file, send, loop
+        )
+
+    def handle(self, scope, body_file, send, loop):
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        set_script_prefix(self.get_script_prefix(scope))
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        request, response = self.create_request(scope, body_file)
+        if request is not None:
+            response = self.get_response(request)
+        response._handler_class = self.__class__
+        if isinstance(response, FileResponse):
+            response.block_size = self.chunk_size
+        try:
+            send_message({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': self.get_response_headers(response),
+            })
+            if response.streaming:
+                for part in response:
+                    for chunk, _ in self.chunk_bytes(part):
+                        send_message({
+                            'type': 'http.response.body',
+                            'body': chunk,
+                            'more_body': True,
+                        })
+                send_message({'type': 'http.response.body'})
+            else:
+                for chunk, last in self.chunk_bytes(response.content):
+                    send_message({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': not last,
+                    })
+        finally:
+            # Sends request_finished, which closes this thread's database
+            # connection according to CONN_MAX_AGE.
+            response.close()
+
+    @staticmethod
+    def get_response_headers(response):
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append((
+                b'Set-Cookie',
+                cookie.output(header='').encode('ascii').strip()
+            ))
+        return headers
+
+
+django.setup(set_prefix=False)
+application = ThreadPoolASGIHandler()
@@ -0,0 +1,93 @@
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import connections
+
+REPLICA = 'replica'
+# Seconds a persistent connection is trusted after a health check.
+HEALTH_CHECK_INTERVAL = getattr(settings, 'DB_HEALTH_CHECK_INTERVAL', 10)
+
+_state = Local()
+
+
+class ReplicaRouter:
+    """
+    Send reads to the replica database while a list or retrieve request
+    is being served, everything else goes to the default database.
+    """
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'use_replica', False):
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+@contextmanager
+def read_from_primary():
+    """
+    Send reads to the default database inside the block, including the
+    prefetches and related lookups it triggers, for data that must not
+    lag behind a write.
+    """
+    use_replica = getattr(_state, 'use_replica', False)
+    _state.use_replica = False
+    try:
+        yield
+    finally:
+        _state.use_replica = use_replica
+
+
+class ReplicaReadMixin:
+    """Read from the replica, if one is configured, for replica_actions."""
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        _state.use_replica = (
+            REPLICA in settings.DATABASES
+            and self.action in self.replica_actions
+        )
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        _state.use_replica = False
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ConnectionHealthCheckMiddleware:
+    """
+    Check persistent connections before a request reuses them, so a
+    connection the server dropped is replaced instead of failing the
+    request. Django only supports CONN_HEALTH_CHECKS from 4.1 on.
+
+    The check is a round trip of its own, so each connection is checked
+    at most once every HEALTH_CHECK_INTERVAL seconds rather than on every
+    request.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        now = time.monotonic()
+        for connection in connections.all():
+            if (not connection.settings_dict.get('CONN_HEALTH_CHECKS')
+                    or connection.connection is None):
+                continue
+            checked = getattr(connection, 'health_checked_at', None)
+            if checked is not None and now - checked < HEALTH_CHECK_INTERVAL:
+                continue
+            if connection.is_usable():
+                connection.health_checked_at = now
+            else:
+                connection.close()
+        return self.get_response(request)
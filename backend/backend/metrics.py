@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+METRICS = (
+    ('requests_total', 'Requests served.'),
+    ('queries_total', 'SQL queries run.'),
+    ('db_seconds_total', 'Time spent in the database.'),
+    ('serialize_seconds_total',
+     'Time spent in the view outside the database, serializing.'),
+    ('render_seconds_total', 'Time spent rendering the response.'),
+    ('response_bytes_total', 'Response body bytes, streams excluded.'),
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A request made more queries than its action is allowed."""
+
+
+class Registry:
+    """Per-process totals for each (view action, method) pair."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = defaultdict(lambda: dict.fromkeys(
+            (name for name, _ in METRICS), 0
+        ))
+
+    def add(self, action, method, values):
+        with self.lock:
+            totals = self.totals[(action, method)]
+            for name, value in values.items():
+                totals[name] += value
+
+    def export(self):
+        """The totals in the Prometheus text exposition format."""
+        with self.lock:
+            totals = {key: dict(values) for key, values in self.totals.items()}
+        lines = []
+        for name, description in METRICS:
+            lines.append(f'# HELP foodgram_{name} {description}')
+            lines.append(f'# TYPE foodgram_{name} counter')
+            for (action, method), values in sorted(totals.items()):
+                lines.append(
+                    f'foodgram_{name}{{action="{action}",method="{method}"}} '
+                    f'{values[name]:g}'
+                )
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+class InstrumentationMiddleware:
+    """
+    Record queries, database time, serializing time, rendering time and
+    response size of each request under its URL name (the view action,
+    e.g. recipe_api-list), report them in a Server-Timing header and
+    add them to the totals served at /metrics/.
+
+    Serializing is the time the view spends outside the database; DRF
+    views call the serializers there. Rendering starts when the view
+    returns.
+
+    QUERY_BUDGETS maps "recipe_api-list" or "POST recipe_api-list" to the
+    most queries such a request may make. Going over is logged, or
+    raises QueryBudgetExceeded when QUERY_BUDGETS_STRICT is on, as it
+    should be in tests.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        match = request.resolver_match
+        if match is None or not match.url_name:
+            return response
+        view_started = getattr(request, '_view_started', started)
+        view_finished = getattr(request, '_view_finished', finished)
+        serialize_time = max(0.0, view_finished - view_started
+                             - stats.db_time)
+        render_time = finished - view_finished
+        size = 0 if response.streaming else len(response.content)
+        registry.add(match.url_name, request.method, {
+            'requests_total': 1,
+            'queries_total': stats.queries,
+            'db_seconds_total': stats.db_time,
+            'serialize_seconds_total': serialize_time,
+            'render_seconds_total': render_time,
+            'response_bytes_total': size,
+        })
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={stats.db_time * 1000:.1f};'
+            f'desc="{stats.queries} queries"',
+            f'serialize;dur={serialize_time * 1000:.1f}',
+            f'render;dur={render_time * 1000:.1f}',
+            f'total;dur={(finished - started) * 1000:.1f}',
+        ))
+        self.check_budget(request, match.url_name, stats.queries)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Called with DRF responses before they are rendered.
+        request._view_finished = time.perf_counter()
+        return response
+
+    @staticmethod
+    def check_budget(request, action, queries):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(f'{request.method} {action}', budgets.get(action))
+        if budget is None or queries <= budget:
+            return
+        message = (
+            f'{request.method} {request.path} ({action}) made {queries} '
+            f'queries, the budget is {budget}.'
+        )
+        if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+def metrics(request):
+    return HttpResponse(
+        registry.export(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -26,6 +26,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'backend.db.ConnectionHealthCheckMiddleware',
+    'backend.metrics.InstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -62,9 +64,41 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Keep connections open between requests, checking them first.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE') or 60),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', 'True'
+        ) == 'True',
     }
 }
 
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT') or os.getenv('DB_PORT'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['backend.db.ReplicaRouter']
+
+# Cached responses and per-user data are invalidated in the cache, so
+# every process must share it: memcached when CACHE_LOCATION is set, as
+# in infra/docker-compose.yml. A process-local cache is refused by the
+# recipes.E001 check unless ALLOW_PROCESS_LOCAL_CACHE is on.
+CACHES = {
+    'default': {
+        'BACKEND': (
+            os.getenv('CACHE_BACKEND')
+            or ('django.core.cache.backends.memcached.MemcachedCache'
+                if os.getenv('CACHE_LOCATION')
+                else 'django.core.cache.backends.locmem.LocMemCache')
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+ALLOW_PROCESS_LOCAL_CACHE = os.getenv('ALLOW_PROCESS_LOCAL_CACHE') == 'True'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -95,18 +129,69 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Chunked image uploads in progress; kept out of MEDIA_ROOT, which is public.
+UPLOAD_ROOT = os.getenv('UPLOAD_ROOT') or os.path.join(BASE_DIR, 'uploads')
+
+# A TTF font covering the Cyrillic ingredient names of the PDF shopping
+# list; the Dockerfile installs it with fonts-dejavu-core.
+SHOPPING_CART_PDF_FONT = (
+    os.getenv('SHOPPING_CART_PDF_FONT')
+    or '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+# Most SQL queries a request may make, per URL name and optionally
+# method, with cold per-user and recipe fragment caches, whether images
+# are sent in base64 or as an upload token. Over budget
+# requests are logged, or fail when QUERY_BUDGETS_STRICT is on, as in
+# backend.settings_test; recipes.tests sends a request to each of them.
+QUERY_BUDGETS = {
+    'recipe_api-list': 9,
+    'POST recipe_api-list': 25,
+    'recipe_api-detail': 7,
+    'PATCH recipe_api-detail': 21,
+    'DELETE recipe_api-detail': 14,
+    'recipe_api-favorite': 7,
+    'recipe_api-add-to-shopping-cart': 7,
+    'recipe_api-favorite-batch': 7,
+    'recipe_api-shopping-cart-batch': 7,
+    'recipe_api-download-shopping-cart': 2,
+    'recipe_api-feed': 9,
+    'upload_api-list': 3,
+    'upload_api-detail': 4,
+    'tag_api-list': 3,
+    'tag_api-detail': 3,
+    'ingredient_api-list': 4,
+    'ingredient_api-detail': 4,
+    'user-list': 4,
+    'user-get-subscriptions': 4,
+}
+QUERY_BUDGETS_STRICT = os.getenv('QUERY_BUDGETS_STRICT') == 'True'
+
+# Views served at the same time by one ASGI process, see backend/asgi.py.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS') or 32)
 
 AUTH_USER_MODEL = 'users.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    'DEFAULT_RENDERER_CLASSES': (
+        'backend.renderers.ORJSONRenderer',
+        'backend.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'backend.parsers.ORJSONParser',
+        'backend.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 DJOSER = {
@@ -0,0 +1,42 @@
+"""
+Settings for workers that only serve /api/: no admin, API docs, sessions
+or messages, and no browsable API, so they start and answer sooner. Run
+the admin on workers with the full backend.settings.
+"""
+import sys
+
+from backend.settings import *  # noqa: F403
+from backend.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+SKIPPED_APPS = (
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'drf_yasg',
+    'colorfield',
+)
+SKIPPED_MIDDLEWARE = (
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+)
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in SKIPPED_APPS]
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE
+    if middleware not in SKIPPED_MIDDLEWARE
+]
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': tuple(
+        renderer for renderer in REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']
+        if renderer != 'rest_framework.renderers.BrowsableAPIRenderer'
+    ),
+}
+
+# DRF and django-filter import coreapi, and requests with it, whenever it
+# is installed, only to offer coreapi schemas. drf_yasg needs it for the
+# docs, which these workers do not serve, so make the import fail here.
+for module in ('coreapi', 'coreschema'):
+    sys.modules.setdefault(module, None)
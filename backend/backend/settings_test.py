@@ -0,0 +1,33 @@
+"""
+Settings for the test suite: SQLite, a local memory cache and enforced
+query budgets, so the tests need no PostgreSQL server. Run them with
+python manage.py test --settings=backend.settings_test
+"""
+import os
+import tempfile
+
+from backend.settings import *  # noqa: F403
+from backend.settings import BASE_DIR
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+# The tests run in a single process.
+ALLOW_PROCESS_LOCAL_CACHE = True
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+MEDIA_ROOT = tempfile.mkdtemp(prefix='foodgram-media-')
+UPLOAD_ROOT = tempfile.mkdtemp(prefix='foodgram-uploads-')
+RECIPE_IMAGE_WORKERS = 0
+
+QUERY_BUDGETS_STRICT = True
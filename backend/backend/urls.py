@@ -1,15 +1,23 @@
+from django.apps import apps
 from django.conf import settings
 from django.conf.urls.static import static
-from django.contrib import admin
 from django.urls import path
 from django.urls.conf import include
 
+from backend.metrics import metrics
+
 urlpatterns = [
-    path('admin/', admin.site.urls),
     path('api/', include('users.urls')),
     path('api/', include('recipes.urls')),
+    path('metrics/', metrics, name='metrics'),
 ]
 
+# API-only workers (backend.settings_api) do not install the admin.
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path('admin/', admin.site.urls))
+
 if settings.DEBUG:
 
     urlpatterns += static(
@@ -0,0 +1,153 @@
+import statistics
+import time
+from collections import namedtuple
+from types import SimpleNamespace
+
+from django.db import connection
+
+from benchmarks.runner import busiest_user
+from recipes.autocomplete import search_ingredients
+from recipes.filters import RecipesFilter
+from recipes.models import (Cart, Favourite, Ingredient, Recipe,
+                            RecipeIngredient)
+from recipes.search import search_recipes
+from users.models import Subscription
+
+RESULTS_VERSION = 1
+# Terms the search plans look up; seeded recipes all contain 'recipe'.
+INGREDIENT_QUERY = 'молоко'
+RECIPE_QUERY = 'recipe молоко'
+
+# ``queryset`` is called with the user and recipe the plans are made for.
+Plan = namedtuple('Plan', 'name queryset')
+
+
+def exists(queryset):
+    """The query ``queryset.exists()`` runs, as a queryset to explain."""
+    return queryset.order_by().extra(select={'a': 1}).values('a')[:1]
+
+
+def filtered(data, user):
+    """The recipe ids RecipesFilter selects for a list request."""
+    request = SimpleNamespace(user=user, query_params=data)
+    return RecipesFilter(
+        data, queryset=Recipe.objects.only('id', 'pub_date'), request=request
+    ).qs[:10]
+
+
+def get_plans():
+    return [
+        Plan('favorite_exists', lambda user, recipe: exists(
+            Favourite.objects.filter(user=user, recipe=recipe)
+        )),
+        Plan('cart_exists', lambda user, recipe: exists(
+            Cart.objects.filter(user=user, recipes=recipe)
+        )),
+        Plan('subscription_exists', lambda user, recipe: exists(
+            Subscription.objects.filter(
+                subscribed=user, user_id=recipe.author_id
+            )
+        )),
+        Plan('favorite_ids', lambda user, recipe: Favourite.objects.filter(
+            user_id=user.id
+        ).order_by('recipe_id').values_list('recipe_id', flat=True)),
+        Plan('cart_ids', lambda user, recipe: Cart.objects.filter(
+            user_id=user.id
+        ).order_by('recipes_id').values_list('recipes_id', flat=True)),
+        Plan('filter_is_favorited', lambda user, recipe: filtered(
+            {'is_favorited': 'true'}, user
+        )),
+        Plan('filter_is_in_shopping_cart', lambda user, recipe: filtered(
+            {'is_in_shopping_cart': 'true'}, user
+        )),
+        Plan('recipe_ingredients', lambda user, recipe: (
+            RecipeIngredient.objects.filter(
+                recipes_id=recipe.id
+            ).select_related('ingredients')
+        )),
+        Plan('ingredient_search', lambda user, recipe: search_ingredients(
+            Ingredient.objects.all(), INGREDIENT_QUERY
+        )),
+        Plan('recipe_search', lambda user, recipe: search_recipes(
+            Recipe.objects.only('id', 'name'), RECIPE_QUERY
+        )[:10]),
+    ]
+
+
+def explain(queryset):
+    """
+    The plan of ``queryset``, with the actual row counts and timings where
+    the database can run EXPLAIN ANALYZE.
+    """
+    if connection.vendor == 'postgresql':
+        return queryset.explain(analyze=True, buffers=True)
+    return queryset.explain()
+
+
+def run_plan(queryset, repeat):
+    """Time ``repeat`` runs of ``queryset`` after a warm-up one."""
+    list(queryset.all())
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        list(queryset.all())
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'sql': str(queryset.query),
+        'plan': explain(queryset),
+        'latency_ms': {
+            'min': round(min(timings), 3),
+            'p50': round(statistics.median(timings), 3),
+            'max': round(max(timings), 3),
+        },
+    }
+
+
+def run(repeat=20, names=None):
+    """Explain and time the plans, as a JSON-ready dict."""
+    user = busiest_user()
+    recipe = Recipe.objects.filter(
+        fav_recipe__user=user
+    ).only('id', 'author_id').first()
+    if recipe is None:
+        raise ValueError('There are no favourites, run seed_benchmark first.')
+    results = {}
+    for plan in get_plans():
+        if names and plan.name not in names:
+            continue
+        results[plan.name] = run_plan(plan.queryset(user, recipe), repeat)
+    return {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'database': connection.vendor,
+            'rows': {
+                'recipes': Recipe.objects.count(),
+                'favourites': Favourite.objects.count(),
+                'carts': Cart.objects.count(),
+                'recipe_ingredients': RecipeIngredient.objects.count(),
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    """The latencies and plans of the queries in both runs."""
+    lines = []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        old = before['latency_ms']['p50']
+        new = result['latency_ms']['p50']
+        change = (new - old) / old * 100 if old else 0
+        lines.append(
+            f'{name:<28} p50 {old:8.3f} -> {new:8.3f} ms ({change:+.0f}%)'
+        )
+        lines.append(f'  before:\n{indent(before["plan"])}')
+        lines.append(f'  after:\n{indent(result["plan"])}')
+    return lines
+
+
+def indent(plan):
+    return '\n'.join(f'    {line}' for line in plan.splitlines())
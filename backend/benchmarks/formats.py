@@ -0,0 +1,89 @@
+import base64
+import os
+import time
+from io import BytesIO
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from backend.parsers import MessagePackParser, ORJSONParser
+from backend.renderers import MessagePackRenderer, ORJSONRenderer
+from benchmarks.runner import busiest_user, get_benchmarks, get_clients
+
+# DRF's stock JSON classes first, as the baseline.
+FORMATS = (
+    ('json', JSONRenderer(), JSONParser()),
+    ('orjson', ORJSONRenderer(), ORJSONParser()),
+    ('msgpack', MessagePackRenderer(), MessagePackParser()),
+)
+RESPONSES = ('recipes_list', 'recipe_detail', 'feed', 'subscriptions')
+IMAGE_SIZE = 1024 * 1024
+
+
+def recipe_body():
+    """A recipe create request with a 1 MB base64 image."""
+    image = base64.b64encode(os.urandom(IMAGE_SIZE)).decode()
+    return {
+        'name': 'Benchmark',
+        'text': 'Benchmark recipe. ' * 50,
+        'cooking_time': 30,
+        'tags': [1, 2],
+        'ingredients': [{'id': pk, 'amount': 100} for pk in range(1, 11)],
+        'image': f'data:image/png;base64,{image}',
+    }
+
+
+def get_payloads():
+    """The data of the heaviest responses, and of a recipe upload."""
+    user = busiest_user()
+    if user is None:
+        raise ValueError('There are no users, run seed_benchmark first.')
+    clients = get_clients(user)
+    payloads = {}
+    for benchmark in get_benchmarks():
+        if benchmark.name in RESPONSES:
+            response = clients[benchmark.authenticated].get(
+                benchmark.path(0)
+            )
+            payloads[benchmark.name] = response.data
+    payloads['recipe_create'] = recipe_body()
+    return payloads
+
+
+def time_us(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) * 1e6 / repeat
+
+
+def run_formats(repeat=200):
+    """
+    Size, render and parse time of every payload in every format, with
+    the change against DRF's JSON.
+    """
+    results = {}
+    for name, data in get_payloads().items():
+        results[name] = {}
+        for format_name, renderer, parser in FORMATS:
+            body = renderer.render(data, renderer.media_type, {})
+            results[name][format_name] = {
+                'bytes': len(body),
+                'render_us': round(time_us(
+                    lambda: renderer.render(data, renderer.media_type, {}),
+                    repeat
+                ), 1),
+                'parse_us': round(time_us(
+                    lambda: parser.parse(BytesIO(body), parser.media_type),
+                    repeat
+                ), 1),
+            }
+        baseline = results[name][FORMATS[0][0]]
+        for result in results[name].values():
+            result['render_speedup'] = round(
+                baseline['render_us'] / result['render_us'], 2
+            )
+            result['parse_speedup'] = round(
+                baseline['parse_us'] / result['parse_us'], 2
+            )
+    return results
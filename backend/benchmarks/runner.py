@@ -0,0 +1,220 @@
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import django
+from django.db import connection, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Cart, Ingredient, Recipe
+from users.models import Subscription, User
+
+RESULTS_VERSION = 1
+
+# ``path`` is called with the number of the request, so a benchmark can
+# vary its query and get past the response caches.
+Benchmark = namedtuple('Benchmark', 'name path authenticated')
+
+
+def busiest_user():
+    """The user with the largest shopping cart, the worst case."""
+    return User.objects.annotate(
+        carts=Count('cart_user')
+    ).order_by('-carts', 'id').first()
+
+
+def search_terms():
+    terms = sorted({
+        name[:3] for name in Ingredient.objects.values_list('name', flat=True)
+        if len(name) >= 3
+    })
+    return terms or ['a']
+
+
+def get_benchmarks():
+    recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+    middle_page = max(1, Recipe.objects.count() // 20)
+    terms = search_terms()
+    return [
+        Benchmark('recipes_list', lambda i: '/api/recipes/', True),
+        Benchmark('recipes_list_anonymous', lambda i: '/api/recipes/', False),
+        Benchmark(
+            'recipes_list_middle_page',
+            lambda i: f'/api/recipes/?page={middle_page}',
+            True
+        ),
+        Benchmark(
+            'recipes_list_cursor',
+            lambda i: '/api/recipes/?pagination=cursor',
+            True
+        ),
+        Benchmark(
+            'recipes_popular',
+            lambda i: '/api/recipes/?ordering=popular',
+            True
+        ),
+        Benchmark(
+            'recipes_favorited',
+            lambda i: '/api/recipes/?is_favorited=true',
+            True
+        ),
+        Benchmark(
+            'recipes_search',
+            lambda i: '/api/recipes/?search=recipe',
+            True
+        ),
+        Benchmark(
+            'recipe_detail',
+            lambda i: f'/api/recipes/{recipe.id if recipe else 0}/',
+            True
+        ),
+        Benchmark(
+            'download_shopping_cart',
+            lambda i: '/api/recipes/download_shopping_cart/',
+            True
+        ),
+        Benchmark(
+            'download_shopping_cart_csv',
+            lambda i: '/api/recipes/download_shopping_cart/?file_format=csv',
+            True
+        ),
+        Benchmark('feed', lambda i: '/api/recipes/feed/', True),
+        Benchmark(
+            'subscriptions',
+            lambda i: '/api/users/subscriptions/?recipes_limit=3',
+            True
+        ),
+        Benchmark(
+            'ingredient_search',
+            lambda i: f'/api/ingredients/?name={terms[i % len(terms)]}',
+            False
+        ),
+        Benchmark('tags', lambda i: '/api/tags/', False),
+    ]
+
+
+def read_response(response):
+    if response.streaming:
+        return len(b''.join(response.streaming_content))
+    return len(response.content)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_benchmark(client, benchmark, repeat):
+    """
+    Time ``repeat`` requests after a warm-up one, then count the queries
+    and trace the allocations of one more request each.
+    """
+    response = client.get(benchmark.path(0))
+    timings = []
+    for number in range(1, repeat + 1):
+        path = benchmark.path(number)
+        started = time.perf_counter()
+        read_response(client.get(path))
+        timings.append((time.perf_counter() - started) * 1000)
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(benchmark.path(repeat + 1))
+        size = read_response(response)
+    # The captured queries are read from the connection's log, which the
+    # next request clears.
+    query_count = len(queries)
+    tracemalloc.start()
+    try:
+        read_response(client.get(benchmark.path(repeat + 2)))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'path': benchmark.path(0),
+        'status': response.status_code,
+        'requests': repeat,
+        'latency_ms': {
+            'min': round(min(timings), 3),
+            'p50': round(statistics.median(timings), 3),
+            'p95': round(percentile(timings, 0.95), 3),
+            'mean': round(statistics.mean(timings), 3),
+            'max': round(max(timings), 3),
+        },
+        'queries': query_count,
+        'peak_memory_kb': round(peak / 1024, 1),
+        'response_bytes': size,
+    }
+
+
+def get_clients(user):
+    """Clients by whether they are authenticated as ``user``."""
+    token, _ = Token.objects.get_or_create(user=user)
+    return {
+        True: Client(HTTP_AUTHORIZATION=f'Token {token.key}'),
+        False: Client(),
+    }
+
+
+def run(repeat=20, names=None):
+    """Run the benchmarks and return the results as a JSON-ready dict."""
+    user = busiest_user()
+    if user is None:
+        raise ValueError('There are no users, run seed_benchmark first.')
+    clients = get_clients(user)
+    results = {}
+    for benchmark in get_benchmarks():
+        if names and benchmark.name not in names:
+            continue
+        results[benchmark.name] = run_benchmark(
+            clients[benchmark.authenticated], benchmark, repeat
+        )
+    return {
+        'version': RESULTS_VERSION,
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'rows': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'ingredients': Ingredient.objects.count(),
+                'subscriptions': Subscription.objects.count(),
+            },
+            'user_cart_size': Cart.objects.filter(user=user).count(),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compare two runs. Returns (lines, regressions): a line per benchmark
+    in both runs, and the lines of those where the median latency grew by
+    more than ``threshold`` or the number of queries went up.
+    """
+    lines, regressions = [], []
+    for name, result in current['results'].items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        old_p50 = before['latency_ms']['p50']
+        new_p50 = result['latency_ms']['p50']
+        change = (new_p50 - old_p50) / old_p50 if old_p50 else 0
+        line = (
+            f'{name}: p50 {old_p50:.1f} -> {new_p50:.1f} ms '
+            f'({change:+.0%}), queries {before["queries"]} -> '
+            f'{result["queries"]}, memory {before["peak_memory_kb"]:.0f} '
+            f'-> {result["peak_memory_kb"]:.0f} KB'
+        )
+        lines.append(line)
+        if change > threshold or result['queries'] > before['queries']:
+            regressions.append(line)
+    return lines, regressions
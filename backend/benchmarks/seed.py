@@ -0,0 +1,169 @@
+import random
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from PIL import Image
+
+from recipes.cache import bump_version
+from recipes.counters import recount
+from recipes.feed import recount_followers
+from recipes.models import (Cart, Favourite, Ingredient, Recipe,
+                            RecipeIngredient, Tag)
+from recipes.search import update_search_vectors
+from users.models import Subscription, User
+
+BATCH_SIZE = 1000
+IMAGE_NAME = 'recipes/benchmark.png'
+TAGS = 10
+INGREDIENTS_PER_RECIPE = (3, 10)
+TAGS_PER_RECIPE = (1, 3)
+FAVOURITES_PER_RECIPE = 3
+CARTS_PER_RECIPE = 1
+SUBSCRIPTIONS_PER_USER = 5
+
+
+def batched(objects, size=BATCH_SIZE):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, size))
+        if not batch:
+            return
+        yield batch
+
+
+def create(model, objects):
+    """
+    Insert the objects in batches and return the ids of the new rows,
+    which bulk_create only sets on PostgreSQL.
+    """
+    ids = []
+    for batch in batched(objects):
+        last_id = model.objects.order_by('-id').values_list(
+            'id', flat=True
+        ).first() or 0
+        model.objects.bulk_create(batch)
+        ids.extend(model.objects.filter(id__gt=last_id).order_by(
+            'id'
+        ).values_list('id', flat=True))
+    return ids
+
+
+def insert(model, objects):
+    count = 0
+    for batch in batched(objects):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+        count += len(batch)
+    return count
+
+
+def save_image():
+    if not default_storage.exists(IMAGE_NAME):
+        buffer = BytesIO()
+        Image.new('RGB', (480, 320), (230, 160, 60)).save(buffer, 'PNG')
+        default_storage.save(IMAGE_NAME, ContentFile(buffer.getvalue()))
+
+
+@transaction.atomic
+def seed(scale, seed=0):
+    """
+    Fill the database with ``scale`` recipes, scale / 10 users and their
+    favourites, shopping carts and subscriptions. The same seed always
+    produces the same data. Returns the number of rows created per model.
+    """
+    rng = random.Random(seed)
+    label = f'bench{seed}x{scale}'
+    if not Ingredient.objects.exists():
+        call_command('load_ingredients', verbosity=0)
+    ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+    save_image()
+    created = {}
+
+    # Passwords are unique; unusable ones are cheap to make and the
+    # benchmarks sign in with tokens anyway.
+    user_ids = create(User, (
+        User(
+            email=f'{label}_{number}@example.com',
+            username=f'{label}_{number}',
+            password=make_password(None)
+        )
+        for number in range(max(10, scale // 10))
+    ))
+    created['users'] = len(user_ids)
+    tag_ids = create(Tag, (
+        Tag(name=f'{label} {number}', slug=f'{label}-{number}',
+            color=f'#{rng.randrange(0x1000000):06X}')
+        for number in range(TAGS)
+    ))
+    created['tags'] = len(tag_ids)
+
+    recipe_ids = []
+    created['recipe ingredients'] = created['recipe tags'] = 0
+    for batch in batched(range(scale)):
+        ids = create(Recipe, (
+            Recipe(
+                author_id=rng.choice(user_ids),
+                name=f'{label} recipe {number}',
+                text='Mix everything and cook until done.',
+                cooking_time=rng.randint(1, 180),
+                image=IMAGE_NAME
+            )
+            for number in batch
+        ))
+        recipe_ids.extend(ids)
+        created['recipe ingredients'] += insert(RecipeIngredient, (
+            RecipeIngredient(
+                recipes_id=recipe_id,
+                ingredients_id=ingredient_id,
+                amount=rng.randint(1, 500)
+            )
+            for recipe_id in ids
+            for ingredient_id in rng.sample(
+                ingredient_ids,
+                min(rng.randint(*INGREDIENTS_PER_RECIPE), len(ingredient_ids))
+            )
+        ))
+        created['recipe tags'] += insert(Recipe.tags.through, (
+            Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+            for recipe_id in ids
+            for tag_id in rng.sample(tag_ids, rng.randint(*TAGS_PER_RECIPE))
+        ))
+    created['recipes'] = len(recipe_ids)
+
+    def per_user(count):
+        return min(len(recipe_ids), max(1, count // len(user_ids)))
+
+    created['favourites'] = insert(Favourite, (
+        Favourite(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(
+            recipe_ids, per_user(scale * FAVOURITES_PER_RECIPE)
+        )
+    ))
+    created['carts'] = insert(Cart, (
+        Cart(user_id=user_id, recipes_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rng.sample(
+            recipe_ids, per_user(scale * CARTS_PER_RECIPE)
+        )
+    ))
+    created['subscriptions'] = insert(Subscription, (
+        Subscription(user_id=author_id, subscribed_id=user_id)
+        for user_id in user_ids
+        for author_id in rng.sample(
+            user_ids, min(SUBSCRIPTIONS_PER_USER, len(user_ids))
+        )
+        if author_id != user_id
+    ))
+
+    if recipe_ids:
+        recount(Recipe.objects.filter(id__gte=recipe_ids[0]))
+        update_search_vectors(Recipe.objects.filter(id__gte=recipe_ids[0]))
+    if created['subscriptions']:
+        recount_followers()
+    bump_version(Tag)
+    return created
@@ -0,0 +1,78 @@
+"""
+Start a backend process and serve one request, reporting the import time
+and the time to the first response as JSON. Run it in a fresh
+interpreter, usually with -X importtime, as the importtime command does.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import time
+from wsgiref.util import setup_testing_defaults
+
+
+def serve_wsgi(application, path):
+    environ = {'PATH_INFO': path, 'REQUEST_METHOD': 'GET'}
+    setup_testing_defaults(environ)
+    statuses = []
+    response = application(
+        environ, lambda status, headers, exc_info=None: statuses.append(status)
+    )
+    try:
+        b''.join(response)
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(statuses[0].split()[0])
+
+
+def serve_asgi(application, path):
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': b'',
+        'root_path': '',
+        'headers': [(b'host', b'127.0.0.1')],
+        'server': ('127.0.0.1', 80),
+        'client': ('127.0.0.1', 0),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return messages[0]['status']
+
+
+SERVERS = {'wsgi': serve_wsgi, 'asgi': serve_asgi}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--app', choices=SERVERS, default='wsgi')
+    parser.add_argument('--path', default='')
+    options = parser.parse_args()
+
+    started = time.perf_counter()
+    module = importlib.import_module(f'backend.{options.app}')
+    imported = time.perf_counter()
+    result = {'import_ms': (imported - started) * 1000}
+    if options.path:
+        result['status'] = SERVERS[options.app](
+            module.application, options.path
+        )
+        result['first_response_ms'] = (time.perf_counter() - started) * 1000
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
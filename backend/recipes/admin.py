@@ -5,6 +5,7 @@ from recipes.models.favourite import Favourite
 from recipes.models.ingredient import Ingredient
 from recipes.models.recipe import Recipe, RecipeIngredient
 from recipes.models.tag import Tag
+from recipes.search import search_recipes
 
 
 class IngredientInline(admin.TabularInline):
@@ -16,7 +17,7 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = [IngredientInline]
 
     def recipe_favorited_count(self, obj):
-        return obj.fav_recipe.count()
+        return obj.favorites_count
     recipe_favorited_count.short_description = 'Favorited count'
 
     fields = (
@@ -33,6 +34,11 @@ class RecipeAdmin(admin.ModelAdmin):
     readonly_fields = ('recipe_favorited_count',)
     empty_value_display = '-empty-'
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search_recipes(queryset, search_term), False
+
 
 @admin.register(Ingredient)
 class IngredientAdmin(admin.ModelAdmin):
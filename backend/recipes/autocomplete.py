@@ -0,0 +1,116 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Lower
+
+from recipes.models import Ingredient
+from recipes.pagination import DefaultResultsSetPagination
+
+# Ranked matches are served as one page of the ingredient list, so more
+# than a page holds would be cut off by the paginator.
+SEARCH_LIMIT = getattr(
+    settings, 'INGREDIENT_SEARCH_LIMIT',
+    DefaultResultsSetPagination.max_page_size
+)
+
+_trie = None
+
+
+class IngredientTrie:
+    """
+    An in-process prefix tree over ingredient names.
+
+    Every node keeps the first ``limit`` matching ingredient ids in name
+    order, so a lookup costs one walk down the tree. Names are indexed
+    twice: as a whole, and by every word after the first one, so that
+    "сок" finds "абрикосовый сок" after the names starting with "сок".
+    """
+    def __init__(self, ingredients, limit=SEARCH_LIMIT):
+        self.limit = limit
+        self.names = {}
+        self.words = {}
+        for pk, name in sorted(ingredients, key=lambda item: item[1].lower()):
+            words = name.lower().split()
+            if not words:
+                continue
+            self.insert(self.names, ' '.join(words), pk)
+            for word in words[1:]:
+                self.insert(self.words, word, pk)
+
+    def insert(self, root, key, pk):
+        node = root
+        for char in key:
+            node = node.setdefault(char, {})
+            ids = node.setdefault(None, [])
+            if len(ids) < self.limit and pk not in ids:
+                ids.append(pk)
+
+    @staticmethod
+    def lookup(root, key):
+        node = root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return []
+        return node.get(None, [])
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+        result = list(self.lookup(self.names, query)[:limit])
+        for pk in self.lookup(self.words, query):
+            if len(result) >= limit:
+                break
+            if pk not in result:
+                result.append(pk)
+        return result
+
+
+def get_trie():
+    global _trie
+    if _trie is None:
+        _trie = IngredientTrie(
+            Ingredient.objects.order_by().values_list('id', 'name')
+        )
+    return _trie
+
+
+def reset_trie(**kwargs):
+    global _trie
+    _trie = None
+
+
+def search_ingredients(queryset, query, limit=SEARCH_LIMIT):
+    """
+    Ingredients whose name starts with ``query`` followed by the ones
+    that only contain it, capped at ``limit`` rows.
+
+    On PostgreSQL the substring match, which prefixes also satisfy, hits
+    the lower(name) trigram index; other databases are served from the
+    in-process trie.
+    """
+    query = query.strip()
+    if not query:
+        return queryset.none()
+    if connection.vendor != 'postgresql':
+        ids = get_trie().search(query, limit)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(
+            *[When(id=pk, then=Value(position))
+              for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        ))
+    query = query.lower()
+    return queryset.annotate(
+        lower_name=Lower('name')
+    ).filter(
+        lower_name__contains=query
+    ).annotate(
+        match_rank=Case(
+            When(lower_name__startswith=query, then=Value(0)),
+            default=Value(1),
+            output_field=IntegerField()
+        )
+    ).order_by('match_rank', 'lower_name')[:limit]
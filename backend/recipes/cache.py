@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.http import (http_date, parse_http_date_safe,
+                               quote_etag)
+from rest_framework import status
+from rest_framework.response import Response
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def version_key(model):
+    return f'reference:{model._meta.label_lower}:version'
+
+
+def bump_version(model):
+    """Make every cached response for ``model`` stale."""
+    previous = cache.get(version_key(model)) or {'modified': 0}
+    version = {
+        'token': time.time_ns(),
+        # Last-Modified has a one second resolution, so two changes within
+        # the same second must still produce different values.
+        'modified': max(int(time.time()), previous['modified'] + 1),
+    }
+    cache.set(version_key(model), version, None)
+    return version
+
+
+def get_version(model):
+    version = cache.get(version_key(model))
+    if version is None:
+        version = bump_version(model)
+    return version
+
+
+def invalidate_reference_cache(sender, **kwargs):
+    # Bumped before the commit, a concurrent request could cache the
+    # old rows under the new version.
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+def recipe_version_key(recipe_id):
+    return f'fragment:recipe:{recipe_id}:version'
+
+
+def get_recipe_versions(recipe_ids):
+    """A version token per recipe, made up for the recipes without one."""
+    keys = {recipe_version_key(recipe_id): recipe_id
+            for recipe_id in recipe_ids}
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, REFERENCE_CACHE_TIMEOUT)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate_recipes(recipe_ids):
+    """Make the cached fragments of the recipes stale."""
+    cache.delete_many([recipe_version_key(pk) for pk in recipe_ids])
+
+
+class CachedReferenceMixin:
+    """
+    Serve list and retrieve from the cache, keyed by a per-model version
+    that the post_save/post_delete signals bump, and answer conditional
+    requests with 304 Not Modified.
+    """
+    def get_cache_entry(self, request):
+        version = get_version(self.queryset.model)
+        path = request.get_full_path()
+        etag = hashlib.md5(
+            f'{version["token"]}:{path}'.encode()
+        ).hexdigest()
+        return version, etag, f'reference:{etag}'
+
+    def is_not_modified(self, request, etag, modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            return quote_etag(etag) in (
+                tag.strip() for tag in if_none_match.split(',')
+            ) or if_none_match.strip() == '*'
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return (if_modified_since is not None
+                and modified <= if_modified_since)
+
+    def cached_response(self, request, view, *args, **kwargs):
+        version, etag, key = self.get_cache_entry(request)
+        if self.is_not_modified(request, etag, version['modified']):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            data = cache.get(key)
+            if data is None:
+                data = view(request, *args, **kwargs).data
+                cache.set(key, data, REFERENCE_CACHE_TIMEOUT)
+            response = Response(data)
+        response['ETag'] = quote_etag(etag)
+        response['Last-Modified'] = http_date(version['modified'])
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, super().retrieve, *args, **kwargs
+        )
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose entries other processes cannot see or delete.
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The user flags, recipe fragments, reference responses and token
+    snapshots are invalidated through the cache. With a cache local to
+    each process, the other processes keep serving what was invalidated
+    until it expires.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if (backend not in PROCESS_LOCAL_CACHES
+            or getattr(settings, 'ALLOW_PROCESS_LOCAL_CACHE', False)):
+        return []
+    return [Error(
+        f'The default cache, {backend}, is local to each process.',
+        hint=(
+            'Set CACHE_LOCATION to a memcached server, or set '
+            'ALLOW_PROCESS_LOCAL_CACHE=True when a single process serves '
+            'the API, as the development server does.'
+        ),
+        id='recipes.E001',
+    )]
@@ -0,0 +1,55 @@
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.models import Cart, Favourite, Recipe
+
+COUNTERS = {
+    Favourite: ('recipe', 'favorites_count'),
+    Cart: ('recipes', 'carts_count'),
+}
+
+
+def lock_recipes(recipe_ids):
+    """
+    Lock the recipe rows until the end of the transaction, so requests
+    touching the same recipes run one after another.
+    """
+    return list(Recipe.objects.select_for_update().filter(
+        id__in=recipe_ids
+    ).order_by('id').values_list('id', flat=True))
+
+
+def change_counter(model, recipe_ids, delta):
+    if not recipe_ids:
+        return
+    field, counter = COUNTERS[model]
+    Recipe.objects.filter(id__in=recipe_ids).update(
+        **{counter: F(counter) + delta}
+    )
+
+
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        field, _ = COUNTERS[sender]
+        change_counter(sender, [getattr(instance, f'{field}_id')], 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    field, _ = COUNTERS[sender]
+    change_counter(sender, [getattr(instance, f'{field}_id')], -1)
+
+
+def recount(queryset=None):
+    """Recalculate the counters from the Favourite and Cart rows."""
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    counts = {}
+    for model, (field, counter) in COUNTERS.items():
+        counts[counter] = Coalesce(Subquery(
+            model.objects.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                total=Count('id')
+            ).values('total')
+        ), Value(0))
+    return queryset.update(**counts)
@@ -0,0 +1,154 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from recipes.flags import load_ids
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+# Authors with more followers than this are not fanned out; their
+# recipes are read from the recipe table when a feed page is built.
+FANOUT_LIMIT = getattr(settings, 'FEED_FANOUT_LIMIT', 10000)
+# Recipes of an author copied into a feed on subscribe, and the most
+# entries a feed keeps.
+BACKFILL_SIZE = getattr(settings, 'FEED_BACKFILL_SIZE', 50)
+MAX_ENTRIES = getattr(settings, 'FEED_MAX_ENTRIES', 1000)
+PULL_AUTHORS_KEY = 'feed:pull-authors'
+PULL_AUTHORS_TIMEOUT = 60 * 5
+BATCH_SIZE = 1000
+
+
+def pull_authors():
+    """
+    Ids of the authors whose recipes are pulled instead of pushed, read
+    from the index on their followers_count.
+    """
+    authors = cache.get(PULL_AUTHORS_KEY)
+    if authors is None:
+        authors = set(User.objects.filter(
+            followers_count__gt=FANOUT_LIMIT
+        ).values_list('id', flat=True))
+        cache.set(PULL_AUTHORS_KEY, authors, PULL_AUTHORS_TIMEOUT)
+    return authors
+
+
+def change_followers(author_id, delta):
+    User.objects.filter(id=author_id).update(
+        followers_count=F('followers_count') + delta
+    )
+
+
+def recount_followers(queryset=None):
+    """Recalculate followers_count from the Subscription rows."""
+    if queryset is None:
+        queryset = User.objects.all()
+    return queryset.update(followers_count=Coalesce(Subquery(
+        Subscription.objects.filter(
+            user=OuterRef('pk')
+        ).order_by().values('user').annotate(
+            total=Count('id')
+        ).values('total')
+    ), Value(0)))
+
+
+def fan_out(recipe_id, author_id):
+    """Push a new recipe into the feeds of its author's followers."""
+    if author_id in pull_authors():
+        return
+    followers = list(Subscription.objects.filter(
+        user_id=author_id
+    ).values_list('subscribed_id', flat=True)[:FANOUT_LIMIT + 1])
+    if len(followers) > FANOUT_LIMIT:
+        cache.set(
+            PULL_AUTHORS_KEY,
+            pull_authors() | {author_id},
+            PULL_AUTHORS_TIMEOUT
+        )
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for user_id in followers],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    for start in range(0, len(followers), BATCH_SIZE):
+        trim(followers[start:start + BATCH_SIZE])
+
+
+def backfill(user_id, author_id):
+    """Copy the latest recipes of a newly followed author into a feed."""
+    if author_id in pull_authors():
+        return
+    recipe_ids = Recipe.objects.filter(
+        author_id=author_id
+    ).order_by('-id').values_list('id', flat=True)[:BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, recipe_id=recipe_id)
+         for recipe_id in recipe_ids],
+        ignore_conflicts=True
+    )
+    trim([user_id])
+
+
+def trim(user_ids):
+    """
+    Drop the entries past the newest MAX_ENTRIES of each feed, with one
+    DELETE for all the users.
+    """
+    newest_dropped = FeedEntry.objects.filter(
+        user_id=OuterRef('user_id')
+    ).order_by('-recipe_id').values('recipe_id')[MAX_ENTRIES:MAX_ENTRIES + 1]
+    FeedEntry.objects.filter(
+        user_id__in=user_ids, recipe_id__lte=Subquery(newest_dropped)
+    ).delete()
+
+
+def get_feed_page(user, before=None, size=10):
+    """
+    Ids of the newest ``size`` recipes in the user's feed older than the
+    recipe ``before``, and whether there are more.
+
+    Pushed entries come from one range read on the (user, recipe) index;
+    recipes of followed authors that are pulled instead are merged in
+    from a range read on the recipe table.
+    """
+    entries = FeedEntry.objects.filter(user=user)
+    if before is not None:
+        entries = entries.filter(recipe_id__lt=before)
+    ids = list(entries.order_by('-recipe_id').values_list(
+        'recipe_id', flat=True
+    )[:size + 1])
+    pulled = pull_authors().intersection(load_ids(user.id, 'subscriptions'))
+    if pulled:
+        recipes = Recipe.objects.filter(author_id__in=pulled)
+        if before is not None:
+            recipes = recipes.filter(id__lt=before)
+        ids = sorted(set(ids).union(recipes.order_by('-id').values_list(
+            'id', flat=True
+        )[:size + 1]), reverse=True)
+    return ids[:size], len(ids) > size
+
+
+def recipe_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.author_id is not None:
+        transaction.on_commit(
+            lambda: fan_out(instance.id, instance.author_id)
+        )
+
+
+def subscription_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_followers(instance.user_id, 1)
+        transaction.on_commit(
+            lambda: backfill(instance.subscribed_id, instance.user_id)
+        )
+
+
+def subscription_deleted(sender, instance, **kwargs):
+    change_followers(instance.user_id, -1)
+    FeedEntry.objects.filter(
+        user_id=instance.subscribed_id,
+        recipe__author_id=instance.user_id
+    ).delete()
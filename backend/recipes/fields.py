@@ -1,42 +1,201 @@
+import base64
+import binascii
+import os
+import re
+import tempfile
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files import File
 from rest_framework import serializers
 
+from recipes.models import ImageUpload
+
+MAX_IMAGE_SIZE = getattr(settings, 'RECIPE_IMAGE_MAX_SIZE', 20 * 1024 * 1024)
+MAX_IMAGE_SIDE = getattr(settings, 'RECIPE_IMAGE_MAX_SIDE', 8000)
+IMAGE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+# Images up to this size stay in memory, bigger ones go to a temp file.
+SPOOL_SIZE = 1024 * 1024
+# Multiple of 4, so every chunk is a whole number of base64 quads.
+DECODE_CHUNK = 64 * 1024
+# Chunks decoded before the dimensions are checked, enough for the image
+# header to follow up to 64 KB of EXIF data.
+HEADER_CHUNKS = 2
+WHITESPACE = re.compile(r'\s+')
+UPLOAD_TOKEN = re.compile(
+    r'^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+)
+
+
+class UploadedImage(File):
+    """
+    The file of a finished upload, opened when it is first read, so a
+    request that fails validation leaves no file open.
+    """
+    def __init__(self, path, name):
+        self._file = None
+        self.path = path
+        super().__init__(None, name)
+        self.size = os.path.getsize(path)
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = open(self.path, 'rb')
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
 
 class Base64ImageField(serializers.ImageField):
     """
     A Django REST framework field for handling image-uploads.
     It uses base64 for encoding and decoding the contents of the file.
 
+    The payload is decoded chunk by chunk into a spooled temporary file.
+    The dimensions are checked from the image header once the first
+    chunks are decoded, before the rest of the payload.
+
     Heavily based on
     https://github.com/tomchristie/django-rest-framework/pull/1268
     And then copy pasted from stackoverflow.
 
     Updated for Django REST framework 3.
+
+    A token returned by the upload endpoint is accepted in place of the
+    base64 string, and so are raw bytes from a MessagePack body; call
+    release_upload() once the recipe is saved.
     """
+    default_error_messages = {
+        'too_large': f'The image may not exceed {MAX_IMAGE_SIZE} bytes.',
+        'too_many_pixels': (
+            f'The image may not be larger than {MAX_IMAGE_SIDE} pixels '
+            'on either side.'
+        ),
+        'invalid_upload': 'The upload does not exist or is not complete.',
+    }
+
     def to_internal_value(self, data):
-        import base64
-        import uuid
+        if isinstance(data, bytes):
+            return self.from_bytes(data)
+        if not isinstance(data, str):
+            return super().to_internal_value(data)
+        if UPLOAD_TOKEN.match(data):
+            return self.from_upload(data)
+        # Decode from past the data URL header instead of copying the
+        # payload without it.
+        start = 0
+        if data.startswith('data:') and ';base64,' in data:
+            start = data.index(';base64,') + len(';base64,')
+        if WHITESPACE.search(data, start):
+            data = WHITESPACE.sub('', data[start:])
+            start = 0
+        if (len(data) - start) * 3 // 4 > MAX_IMAGE_SIZE:
+            self.fail('too_large')
+
+        return self.to_file(self.decode(data, start))
+
+    def decode(self, data, start):
+        """
+        The base64 payload from ``start`` on, decoded into a spooled file.
+        The dimensions are checked once the header is decoded.
+        """
+        decoded_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        header_end = start + HEADER_CHUNKS * DECODE_CHUNK
+        try:
+            for offset in range(start, len(data), DECODE_CHUNK):
+                decoded_file.write(base64.b64decode(
+                    data[offset:offset + DECODE_CHUNK]
+                ))
+                if offset + DECODE_CHUNK == header_end < len(data):
+                    self.check_header(decoded_file)
+        except (binascii.Error, ValueError):
+            self.fail('invalid_image')
+        return decoded_file
+
+    def from_bytes(self, data):
+        """An image sent as binary, as MessagePack allows."""
+        if len(data) > MAX_IMAGE_SIZE:
+            self.fail('too_large')
+        header_size = HEADER_CHUNKS * DECODE_CHUNK * 3 // 4
+        if len(data) > header_size:
+            self.check_header(BytesIO(data[:header_size]))
+        decoded_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        decoded_file.write(data)
+        return self.to_file(decoded_file)
+
+    def to_file(self, decoded_file):
+        file_extension = self.get_file_extension(decoded_file)
+        file_name = str(uuid.uuid4())[:12]
+        complete_file_name = "%s.%s" % (file_name, file_extension, )
+        # The image has been verified already, so skip the ImageField
+        # check that would read the whole file into memory again.
+        return serializers.FileField.to_internal_value(
+            self, File(decoded_file, name=complete_file_name)
+        )
 
-        import six
-        from django.core.files.base import ContentFile
+    def from_upload(self, token):
+        upload = ImageUpload.objects.filter(
+            id=token, user=self.context.get('request').user
+        ).first()
+        if upload is None or not upload.is_complete:
+            self.fail('invalid_upload')
+        with open(upload.path, 'rb') as uploaded_file:
+            file_extension = self.get_file_extension(uploaded_file)
+        self.upload = upload
+        self.upload_file = UploadedImage(
+            upload.path, f'{upload.id}.{file_extension}'
+        )
+        return serializers.FileField.to_internal_value(
+            self, self.upload_file
+        )
 
-        if isinstance(data, six.string_types):
-            if 'data:' in data and ';base64,' in data:
-                header, data = data.split(';base64,')
-            try:
-                decoded_file = base64.b64decode(data)
-            except TypeError:
-                self.fail('invalid_image')
+    def release_upload(self):
+        """Remove the upload the image was taken from, if any."""
+        upload = getattr(self, 'upload', None)
+        if upload is not None:
+            self.upload_file.close()
+            upload.delete()
+            self.upload = None
 
-            file_name = str(uuid.uuid4())[:12]
-            file_extension = self.get_file_extension(file_name, decoded_file)
-            complete_file_name = "%s.%s" % (file_name, file_extension, )
-            data = ContentFile(decoded_file, name=complete_file_name)
-        return super(Base64ImageField, self).to_internal_value(data)
+    def check_header(self, decoded_file):
+        """
+        Fail for an image too large from the part decoded so far. A header
+        that is not complete yet is checked with the whole file later.
+        """
+        from PIL import Image
 
-    def get_file_extension(self, file_name, decoded_file):
-        import imghdr
+        decoded_file.seek(0)
+        try:
+            size = Image.open(decoded_file).size
+        except Exception:
+            size = (0, 0)
+        decoded_file.seek(0, os.SEEK_END)
+        if max(size) > MAX_IMAGE_SIDE:
+            self.fail('too_many_pixels')
 
-        extension = imghdr.what(file_name, decoded_file)
-        extension = "jpg" if extension == "jpeg" else extension
+    def get_file_extension(self, decoded_file):
+        from PIL import Image
 
-        return extension
+        decoded_file.seek(0)
+        try:
+            image = Image.open(decoded_file)
+            if max(image.size) > MAX_IMAGE_SIDE:
+                self.fail('too_many_pixels')
+            image_format = image.format
+            image.verify()
+        except serializers.ValidationError:
+            raise
+        except Exception:
+            self.fail('invalid_image')
+        decoded_file.seek(0)
+        if image_format not in IMAGE_FORMATS:
+            self.fail('invalid_image')
+        return IMAGE_FORMATS[image_format]
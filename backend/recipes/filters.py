@@ -1,6 +1,8 @@
 import django_filters as filters
 
+from recipes.autocomplete import search_ingredients
 from recipes.models import Cart, Favourite, Ingredient, Recipe, Tag
+from recipes.search import search_recipes
 
 
 class RecipesFilter(filters.FilterSet):
@@ -16,6 +18,11 @@ class RecipesFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_by_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='filter_by_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'),),
+        method='order_by'
+    )
 
     def filter_by_is_favorited(self, queryset, name, value):
         return queryset.filter(id__in=Favourite.objects.filter(
@@ -27,22 +34,32 @@ class RecipesFilter(filters.FilterSet):
             user=self.request.user
         ).values_list('recipes_id', flat=True))
 
+    def filter_by_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
+
+    def order_by(self, queryset, name, value):
+        return queryset.order_by('-favorites_count', '-id')
+
     class Meta:
         model = Recipe
         fields = (
             'tags',
             'is_favorited',
             'is_in_shopping_cart',
-            'author'
+            'author',
+            'search',
+            'ordering'
         )
 
 
 class IngredientsFilter(filters.FilterSet):
     name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
+        method='filter_by_name'
     )
 
+    def filter_by_name(self, queryset, name, value):
+        return search_ingredients(queryset, value)
+
     class Meta:
         model = Ingredient
         fields = ('name',)
@@ -0,0 +1,105 @@
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+
+from recipes.models import Cart, Favourite
+from users.models import Subscription
+
+FLAGS_TIMEOUT = getattr(settings, 'USER_FLAGS_TIMEOUT', 60 * 60)
+# Kind of flag: (model, field of the user, field of the flagged object).
+FLAG_SOURCES = {
+    'favorites': (Favourite, 'user_id', 'recipe_id'),
+    'cart': (Cart, 'user_id', 'recipes_id'),
+    'subscriptions': (Subscription, 'subscribed_id', 'user_id'),
+}
+MODEL_FLAGS = {model: kind for kind, (model, *_) in FLAG_SOURCES.items()}
+
+
+def version_key(user_id, kind):
+    return f'flags:{user_id}:{kind}:version'
+
+
+def flags_key(user_id, kind, version):
+    return f'flags:{user_id}:{kind}:{version}'
+
+
+def get_version(user_id, kind):
+    version = cache.get(version_key(user_id, kind))
+    if version is None:
+        cache.add(version_key(user_id, kind), time.time_ns(), FLAGS_TIMEOUT)
+        version = cache.get(version_key(user_id, kind))
+    return version
+
+
+def load_ids(user_id, kind):
+    """
+    The sorted ids the user has flagged, kept in the cache as a packed
+    array of 32-bit integers and read from the database on a miss.
+
+    The array is stored under the version read before the database, so
+    if a flag changes meanwhile it is stored under a stale version and
+    never read.
+    """
+    key = flags_key(user_id, kind, get_version(user_id, kind))
+    data = cache.get(key)
+    ids = array('I')
+    if data is not None:
+        ids.frombytes(data)
+        return ids
+    model, user_field, object_field = FLAG_SOURCES[kind]
+    # Read from the primary, a lagging replica would be cached as is.
+    ids.extend(model.objects.using(router.db_for_write(model)).filter(
+        **{user_field: user_id}
+    ).order_by(object_field).values_list(object_field, flat=True))
+    cache.set(key, ids.tobytes(), FLAGS_TIMEOUT)
+    return ids
+
+
+def invalidate_ids(user_id, kind):
+    """
+    Make the cached ids stale once the transaction commits; the next read
+    loads them again. Rewriting the array in place would lose one of two
+    concurrent changes.
+    """
+    transaction.on_commit(lambda: cache.set(
+        version_key(user_id, kind), time.time_ns(), FLAGS_TIMEOUT
+    ))
+
+
+class UserFlags:
+    """Answers "has the user flagged this object" from the cached ids."""
+    def __init__(self, user):
+        self.user = user
+        self.ids = {}
+
+    def has(self, kind, object_id):
+        if not self.user.is_authenticated:
+            return False
+        if kind not in self.ids:
+            self.ids[kind] = load_ids(self.user.id, kind)
+        ids = self.ids[kind]
+        index = bisect_left(ids, object_id)
+        return index < len(ids) and ids[index] == object_id
+
+
+def get_flags(request):
+    """The UserFlags of the request, so each set is loaded once."""
+    flags = getattr(request, '_user_flags', None)
+    if flags is None:
+        flags = request._user_flags = UserFlags(request.user)
+    return flags
+
+
+def flag_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _, user_field, _ = FLAG_SOURCES[MODEL_FLAGS[sender]]
+        invalidate_ids(getattr(instance, user_field), MODEL_FLAGS[sender])
+
+
+def flag_deleted(sender, instance, **kwargs):
+    _, user_field, _ = FLAG_SOURCES[MODEL_FLAGS[sender]]
+    invalidate_ids(getattr(instance, user_field), MODEL_FLAGS[sender])
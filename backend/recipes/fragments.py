@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from backend.db import read_from_primary
+from recipes.cache import (get_recipe_versions, get_version,
+                           invalidate_recipes)
+from recipes.flags import get_flags
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.serializers import RecipeListSerializer
+
+# Bump when the output of RecipeListSerializer changes.
+FRAGMENT_VERSION = 1
+FRAGMENT_TIMEOUT = getattr(settings, 'RECIPE_FRAGMENT_TIMEOUT', 60 * 60 * 24)
+# Fields of the author shown in a recipe.
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+def fragment_keys(request, recipe_ids):
+    """
+    The cache key of each recipe's fragment. It changes with the recipe,
+    with any tag or ingredient, and with the host the image URLs are
+    built for.
+    """
+    shared = ':'.join(str(part) for part in (
+        FRAGMENT_VERSION,
+        get_version(Tag)['token'],
+        get_version(Ingredient)['token'],
+        request.build_absolute_uri('/'),
+    ))
+    return {
+        recipe_id: 'fragment:recipe:' + hashlib.md5(
+            f'{shared}:{recipe_id}:{version}'.encode()
+        ).hexdigest()
+        for recipe_id, version in get_recipe_versions(recipe_ids).items()
+    }
+
+
+def add_viewer_flags(fragment, flags):
+    author = fragment['author']
+    if author is not None:
+        author = {
+            **author,
+            'is_subscribed': flags.has('subscriptions', author['id']),
+        }
+    return {
+        **fragment,
+        'author': author,
+        'is_favorited': flags.has('favorites', fragment['id']),
+        'is_in_shopping_cart': flags.has('cart', fragment['id']),
+    }
+
+
+def render_recipes(recipe_ids, queryset, context):
+    """
+    The RecipeListSerializer data of the recipes, in the order of
+    ``recipe_ids``, for the viewer of the request in ``context``.
+
+    The part that is the same for every viewer is cached per recipe;
+    only the recipes missing from the cache are read from ``queryset``
+    and serialized, from the primary database so a lagging replica is
+    not cached under the new version. The viewer's flags are added on
+    top. Ids of recipes that do not exist are skipped.
+    """
+    request = context['request']
+    keys = fragment_keys(request, recipe_ids)
+    cached = cache.get_many(keys.values())
+    missing = [pk for pk in recipe_ids if keys[pk] not in cached]
+    if missing:
+        with read_from_primary():
+            recipes = queryset.in_bulk(missing)
+            data = RecipeListSerializer(
+                [recipes[pk] for pk in missing if pk in recipes],
+                many=True,
+                context=context
+            ).data
+        fragments = {
+            keys[item['id']]: {
+                **item,
+                'author': item['author'] and {
+                    **item['author'], 'is_subscribed': False
+                },
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+            }
+            for item in data
+        }
+        cache.set_many(fragments, FRAGMENT_TIMEOUT)
+        cached.update(fragments)
+    flags = get_flags(request)
+    return [
+        add_viewer_flags(cached[keys[pk]], flags)
+        for pk in recipe_ids if keys[pk] in cached
+    ]
+
+
+def invalidate_recipe(sender, instance, **kwargs):
+    # The tags and ingredients are written after the recipe is saved,
+    # in the same transaction, so this also covers them.
+    recipe_id = instance.id
+    transaction.on_commit(lambda: invalidate_recipes([recipe_id]))
+
+
+def author_changed(sender, instance, created, update_fields=None,
+                   raw=False, **kwargs):
+    if created or raw:
+        return
+    if update_fields is not None and not AUTHOR_FIELDS & set(update_fields):
+        return
+    recipe_ids = list(Recipe.objects.filter(
+        author=instance
+    ).values_list('id', flat=True))
+    transaction.on_commit(lambda: invalidate_recipes(recipe_ids))
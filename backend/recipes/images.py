@@ -0,0 +1,107 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+
+from recipes.cache import invalidate_recipes
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = (
+    ('full', 1280),
+    ('card', 480),
+    ('thumbnail', 160),
+)
+VARIANTS_DIR = 'recipes/variants'
+IMAGE_WORKERS = getattr(settings, 'RECIPE_IMAGE_WORKERS', 2)
+
+_executor = None
+
+
+@lru_cache(maxsize=None)
+def variant_format():
+    # Pillow is only imported once an image is resized or its variants
+    # are listed, which API workers rarely need at startup.
+    from PIL import features
+
+    if features.check('webp'):
+        return 'WEBP', 'webp'
+    return 'JPEG', 'jpg'
+
+
+def variant_name(image_name, variant):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}_{variant}.{variant_format()[1]}'
+
+
+def variant_urls(recipe):
+    """
+    URLs of the resized copies of the recipe image. Until the copies
+    exist every variant points at the original.
+    """
+    if not recipe.image:
+        return None
+    if recipe.image_variants != recipe.image.name:
+        return {variant: recipe.image.url for variant, _ in VARIANTS}
+    return {
+        variant: default_storage.url(variant_name(recipe.image.name, variant))
+        for variant, _ in VARIANTS
+    }
+
+
+def generate_variants(recipe_id, image_name):
+    from PIL import Image, ImageOps
+
+    from recipes.models import Recipe
+
+    image_format, _ = variant_format()
+    with default_storage.open(image_name) as original:
+        image = Image.open(original)
+        image.draft('RGB', (VARIANTS[0][1], VARIANTS[0][1]))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA') or image_format == 'JPEG':
+            image = image.convert('RGB')
+        # Every variant is scaled down from the previous, larger one.
+        for variant, size in VARIANTS:
+            image.thumbnail((size, size), Image.LANCZOS)
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=82)
+            name = variant_name(image_name, variant)
+            default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+    if Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_variants=image_name
+    ):
+        invalidate_recipes([recipe_id])
+
+
+def run_generate_variants(recipe_id, image_name):
+    try:
+        generate_variants(recipe_id, image_name)
+    except Exception:
+        logger.exception('Could not resize the image of recipe %s', recipe_id)
+    finally:
+        if IMAGE_WORKERS:
+            connections.close_all()
+
+
+def schedule_variants(recipe_id, image_name):
+    """
+    Resize the image on the worker pool, or in the calling thread when
+    RECIPE_IMAGE_WORKERS is 0.
+    """
+    global _executor
+    if not IMAGE_WORKERS:
+        return run_generate_variants(recipe_id, image_name)
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            thread_name_prefix='recipe-images'
+        )
+    _executor.submit(run_generate_variants, recipe_id, image_name)
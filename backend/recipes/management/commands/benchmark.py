@@ -0,0 +1,80 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from benchmarks.runner import compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure latency, queries and memory of the API hot paths and '
+        'optionally compare them with an earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed requests per benchmark'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            metavar='NAME',
+            help='Run only these benchmarks'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run to compare with'
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=20,
+            help='Median latency increase, in percent, that fails the run'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # Measure with DEBUG off, as in production.
+        setup_test_environment(debug=False)
+        try:
+            results = run(options['repeat'], options['only'])
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            teardown_test_environment()
+
+        for name, result in results['results'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f'{name:<28} {result["status"]} '
+                f'p50 {latency["p50"]:8.1f} ms  p95 {latency["p95"]:8.1f} ms  '
+                f'{result["queries"]:3} queries  '
+                f'{result["peak_memory_kb"]:9.0f} KB'
+            )
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
+
+        if baseline is None:
+            return
+        lines, regressions = compare(
+            baseline, results, options['threshold'] / 100
+        )
+        self.stdout.write('\n'.join(lines))
+        if regressions:
+            raise CommandError(
+                'Performance regressions:\n' + '\n'.join(regressions)
+            )
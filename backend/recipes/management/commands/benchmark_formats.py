@@ -0,0 +1,49 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+
+from benchmarks.formats import run_formats
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the size, render and parse time of the API payloads in '
+        'DRF JSON, orjson and MessagePack.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=200,
+            help='Renders and parses per payload and format'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment(debug=False)
+        try:
+            results = run_formats(options['repeat'])
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            teardown_test_environment()
+
+        for name, formats in results.items():
+            for format_name, result in formats.items():
+                self.stdout.write(
+                    f'{name:<16} {format_name:<8} '
+                    f'{result["bytes"]:9} B  '
+                    f'render {result["render_us"]:9.1f} us '
+                    f'(x{result["render_speedup"]:.2f})  '
+                    f'parse {result["parse_us"]:9.1f} us '
+                    f'(x{result["parse_speedup"]:.2f})'
+                )
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from recipes.models import ImageUpload
+
+
+class Command(BaseCommand):
+    help = 'Delete image uploads that were never used for a recipe.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Age after which an upload is considered abandoned'
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        deleted = 0
+        # Delete one by one so the files go together with the rows.
+        for upload in ImageUpload.objects.filter(created__lt=cutoff):
+            upload.delete()
+            deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} stale uploads deleted.'
+        ))
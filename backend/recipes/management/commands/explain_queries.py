@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.explain import compare, run
+
+
+class Command(BaseCommand):
+    help = (
+        'Record the plans, with EXPLAIN ANALYZE on PostgreSQL, and latency '
+        'of the favourite, cart and subscription checks, the recipe '
+        'filters and the searches, and optionally compare them with an '
+        'earlier run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed runs per query'
+        )
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            metavar='NAME',
+            help='Explain only these queries'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run to compare with'
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        try:
+            results = run(options['repeat'], options['only'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        if baseline is not None:
+            self.stdout.write('\n'.join(compare(baseline, results)))
+        else:
+            for name, result in results['results'].items():
+                self.stdout.write(
+                    f'{name:<28} p50 {result["latency_ms"]["p50"]:8.3f} ms'
+                )
+                self.stdout.write(result['plan'])
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump(results, output_file, indent=2)
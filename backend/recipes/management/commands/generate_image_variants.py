@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from recipes.images import run_generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Create the resized copies of recipe images that lack them.'
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').exclude(
+            image_variants=F('image')
+        ).values_list('id', 'image').order_by('id')
+        processed = 0
+        for recipe_id, image_name in recipes.iterator():
+            run_generate_variants(recipe_id, image_name)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} recipe images resized.'
+        ))
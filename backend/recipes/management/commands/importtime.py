@@ -0,0 +1,136 @@
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_importtime(output):
+    """
+    The modules in ``python -X importtime`` output, as (name, depth,
+    self us, cumulative us) in import order.
+    """
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        modules.append((name.strip(), depth, int(own), int(cumulative)))
+    return modules
+
+
+def package_of(module):
+    """The top-level package, or the subpackage for Django itself."""
+    parts = module.split('.')
+    if parts[0] != 'django':
+        return parts[0]
+    return '.'.join(parts[:3] if parts[1:2] == ['contrib'] else parts[:2])
+
+
+def group_by_package(modules):
+    """Self import time summed per package."""
+    packages = defaultdict(int)
+    for name, _, own, _ in modules:
+        packages[package_of(name)] += own
+    return packages
+
+
+class Command(BaseCommand):
+    help = (
+        'Start backend.wsgi or backend.asgi in fresh interpreters, serve '
+        'one request and report the time to the first response and the '
+        'cumulative import time per module and package. Pass --settings '
+        'to profile another settings module, e.g. backend.settings_api.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--app',
+            choices=('wsgi', 'asgi'),
+            default='wsgi',
+            help='Application module to start'
+        )
+        parser.add_argument(
+            '--path',
+            default='/api/tags/',
+            help='Path of the first request; empty to only import'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Processes to start; the medians are reported'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=25,
+            help='Modules and packages to list'
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file'
+        )
+
+    def start(self, app, path):
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-m', 'benchmarks.startup',
+             '--app', app, '--path', path],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True
+        )
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        return json.loads(process.stdout.splitlines()[-1]), process.stderr
+
+    def handle(self, *args, **options):
+        runs = [
+            self.start(options['app'], options['path'])
+            for _ in range(max(1, options['repeat']))
+        ]
+        timings = {
+            name: round(statistics.median(run[name] for run, _ in runs), 1)
+            for name in runs[0][0] if name.endswith('_ms')
+        }
+        # The median run by import time, for the breakdown.
+        runs.sort(key=lambda run: run[0]['import_ms'])
+        modules = parse_importtime(runs[len(runs) // 2][1])
+        slowest = sorted(modules, key=lambda module: -module[3])
+        packages = sorted(
+            group_by_package(modules).items(), key=lambda item: -item[1]
+        )
+
+        self.stdout.write(
+            f'{options["app"]}: import {timings["import_ms"]:.1f} ms'
+            + (f', first response {timings["first_response_ms"]:.1f} ms '
+               f'(status {runs[0][0]["status"]})'
+               if 'first_response_ms' in timings else '')
+            + f', {len(modules)} modules'
+        )
+        self.stdout.write('\nCumulative import time per module:')
+        for name, depth, _, cumulative in slowest[:options['limit']]:
+            self.stdout.write(
+                f'{cumulative / 1000:9.1f} ms  {"  " * depth}{name}'
+            )
+        self.stdout.write('\nImport time per package:')
+        for name, own in packages[:options['limit']]:
+            self.stdout.write(f'{own / 1000:9.1f} ms  {name}')
+
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                json.dump({
+                    'app': options['app'],
+                    'settings': settings.SETTINGS_MODULE,
+                    'timings_ms': timings,
+                    'modules': [
+                        {'name': name, 'self_us': own,
+                         'cumulative_us': cumulative}
+                        for name, _, own, cumulative in slowest
+                    ],
+                    'packages': dict(packages),
+                }, output_file, indent=2)
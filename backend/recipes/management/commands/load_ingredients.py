@@ -0,0 +1,110 @@
+import csv
+import os
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.autocomplete import reset_trie
+from recipes.cache import bump_version
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.csv'
+)
+
+UNIT_ALIASES = {
+    'г': 'g',
+    'гр': 'g',
+    'кг': 'kg',
+    'мг': 'mg',
+    'мл': 'ml',
+    'л': 'l',
+    'ст. л.': 'tbsp',
+    'ч. л.': 'tsp',
+    'стакан': 'c',
+    'шт.': 'piece',
+    'шт': 'piece',
+    'по вкусу': 'to taste',
+    'капля': 'drop',
+    'см': 'cm',
+}
+for code, label in Ingredient.MEASUREMENT_UNITS:
+    UNIT_ALIASES.setdefault(code, code)
+    UNIT_ALIASES.setdefault(label, code)
+
+
+def normalize_unit(unit):
+    """
+    Map a unit onto Ingredient.MEASUREMENT_UNITS. Units that have no
+    counterpart there are returned as they are.
+    """
+    unit = ' '.join(unit.lower().split())
+    if unit in UNIT_ALIASES:
+        return UNIT_ALIASES[unit], True
+    return unit, False
+
+
+class Command(BaseCommand):
+    help = 'Load ingredients from a "name,unit" CSV file in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            help='CSV file to load (default: data/ingredients.csv)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per INSERT statement'
+        )
+
+    def read_rows(self, csv_file):
+        self.skipped = 0
+        self.unknown_units = set()
+        for row in csv.reader(csv_file):
+            if len(row) != 2 or not row[0].strip():
+                self.skipped += 1
+                continue
+            unit, known = normalize_unit(row[1])
+            if unit and not known:
+                self.unknown_units.add(unit)
+            yield Ingredient(name=row[0].strip(), measurement_unit=unit)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        batch_size = options['batch_size']
+        if not os.path.isfile(path):
+            raise CommandError(f'File "{path}" does not exist.')
+
+        count_before = Ingredient.objects.count()
+        started = time.monotonic()
+        processed = 0
+        with open(path, encoding='utf-8', newline='') as csv_file:
+            rows = self.read_rows(csv_file)
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                processed += len(batch)
+                self.stdout.write(f'{processed} rows processed', ending='\r')
+        elapsed = time.monotonic() - started
+        reset_trie()
+        bump_version(Ingredient)
+
+        created = Ingredient.objects.count() - count_before
+        self.stdout.write(self.style.SUCCESS(
+            f'{processed} rows processed, {created} ingredients created, '
+            f'{self.skipped} rows skipped in {elapsed:.2f}s '
+            f'({processed / max(elapsed, 1e-6):.0f} rows/s).'
+        ))
+        if self.unknown_units:
+            self.stdout.write(self.style.WARNING(
+                'Units kept as is: '
+                + ', '.join(sorted(self.unknown_units))
+            ))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import recount
+from recipes.feed import recount_followers
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalculate the favorites and shopping cart counters of recipes '
+        'and the followers counters of users.'
+    )
+
+    def handle(self, *args, **options):
+        updated = recount()
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} recipes recounted.'
+        ))
+        updated = recount_followers()
+        self.stdout.write(self.style.SUCCESS(
+            f'{updated} users recounted.'
+        ))
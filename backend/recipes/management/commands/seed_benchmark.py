@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.seed import seed
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with generated data for the benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=1000,
+            help='Number of recipes to create, 10^3 to 10^6'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed, the same seed gives the same data'
+        )
+
+    def handle(self, *args, **options):
+        if options['scale'] < 1:
+            raise CommandError('The scale must be a positive number.')
+        started = time.monotonic()
+        created = seed(options['scale'], options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{count} {name}' for name, count in created.items())
+            + f' created in {time.monotonic() - started:.1f}s.'
+        ))
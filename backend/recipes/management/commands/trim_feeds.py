@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import BATCH_SIZE, MAX_ENTRIES, trim
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = f'Keep only the newest {MAX_ENTRIES} entries of every feed.'
+
+    def handle(self, *args, **options):
+        user_ids = FeedEntry.objects.order_by().values_list(
+            'user_id', flat=True
+        ).distinct()
+        count = 0
+        batch = []
+        for user_id in user_ids.iterator():
+            batch.append(user_id)
+            if len(batch) == BATCH_SIZE:
+                trim(batch)
+                count += len(batch)
+                batch = []
+        trim(batch)
+        count += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'{count} feeds trimmed.'))
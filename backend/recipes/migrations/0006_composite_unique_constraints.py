@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+import django.db.models.deletion
+
+
+def remove_duplicates(apps, schema_editor):
+    """Merge rows that would violate the new unique constraints."""
+    for model_name, fields in (
+        ('Favourite', ('user', 'recipe')),
+        ('Cart', ('user', 'recipes')),
+    ):
+        model = apps.get_model('recipes', model_name)
+        duplicates = model.objects.values(*fields).annotate(
+            keep=Min('id'), rows=Count('id')
+        ).order_by().filter(rows__gt=1)
+        for duplicate in duplicates:
+            model.objects.filter(
+                **{field: duplicate[field] for field in fields}
+            ).exclude(id=duplicate['keep']).delete()
+
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.values(
+        'recipes', 'ingredients'
+    ).annotate(
+        keep=Min('id'), rows=Count('id'), total=Sum('amount')
+    ).order_by().filter(rows__gt=1)
+    for duplicate in duplicates:
+        rows = RecipeIngredient.objects.filter(
+            recipes=duplicate['recipes'],
+            ingredients=duplicate['ingredients']
+        )
+        rows.exclude(id=duplicate['keep']).delete()
+        rows.update(amount=duplicate['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipes'), name='unique cart recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='favourite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique favourite'),
+        ),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipes', 'ingredients'), name='unique recipe ingredient'),
+        ),
+        migrations.AlterField(
+            model_name='cart',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='cart_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='favourite',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='fav_user', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipeingredient',
+            name='recipes',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='recipe', to='recipes.Recipe'),
+        ),
+    ]
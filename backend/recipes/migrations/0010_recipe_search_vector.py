@@ -0,0 +1,51 @@
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+CREATE_INDEX = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector '
+    'ON recipes_recipe USING gin (search_vector)'
+)
+DROP_INDEX = 'DROP INDEX IF EXISTS recipes_recipe_search_vector'
+FILL_VECTORS = """
+UPDATE recipes_recipe SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, coalesce(name, '')), 'A')
+    || setweight(to_tsvector(%(config)s::regconfig, coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_recipeingredient
+        JOIN recipes_ingredient ingredient
+            ON ingredient.id = recipes_recipeingredient.ingredients_id
+        WHERE recipes_recipeingredient.recipes_id = recipes_recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector(%(config)s::regconfig, coalesce(text, '')), 'D')
+"""
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_INDEX)
+    schema_editor.execute(FILL_VECTORS, {
+        'config': getattr(settings, 'RECIPE_SEARCH_CONFIG', 'russian'),
+    })
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -3,3 +3,5 @@ from .ingredient import Ingredient
 from .tag import Tag
 from .cart import Cart
 from .favourite import Favourite
+from .upload import ImageUpload
+from .feed import FeedEntry
@@ -9,6 +9,7 @@ class Cart(models.Model):
         User,
         related_name='cart_user',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     recipes = models.ForeignKey(
         Recipe,
@@ -22,3 +23,9 @@ class Cart(models.Model):
         ordering = ('-pk',)
         verbose_name = 'Shopping cart'
         verbose_name_plural = 'Shopping carts'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipes'),
+                name='unique cart recipe'
+            ),
+        )
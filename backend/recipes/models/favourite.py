@@ -9,6 +9,7 @@ class Favourite(models.Model):
         User,
         related_name='fav_user',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     recipe = models.ForeignKey(
@@ -21,3 +22,9 @@ class Favourite(models.Model):
         ordering = ('-pk',)
         verbose_name = 'Favourite recipe'
         verbose_name_plural = 'Favourite recipes'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique favourite'
+            ),
+        )
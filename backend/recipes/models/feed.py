@@ -0,0 +1,31 @@
+from django.db import models
+
+from recipes.models import Recipe
+from users.models import User
+
+
+class FeedEntry(models.Model):
+    """A recipe pushed into the feed of one of its author's followers."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+
+    class Meta:
+        ordering = ('-recipe',)
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+        constraints = (
+            # Also the index a feed page is read from: user, recipe id.
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique feed entry'
+            ),
+        )
@@ -37,6 +37,12 @@ class Ingredient(models.Model):
         ordering = ('-pk',)
         verbose_name = 'Ingredient'
         verbose_name_plural = 'Ingredients'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique ingredient'
+            ),
+        )
 
     def __str__(self):
         return self.name
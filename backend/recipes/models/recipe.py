@@ -1,3 +1,4 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
@@ -30,6 +31,12 @@ class Recipe(models.Model):
         upload_to='recipes/',
         max_length=None,
     )
+    image_variants = models.CharField(
+        'image the resized copies were made from',
+        max_length=255,
+        blank=True,
+        editable=False,
+    )
     name = models.CharField(
         'recipe name',
         max_length=200,
@@ -48,6 +55,20 @@ class Recipe(models.Model):
             message='You can not save time while cooking.'
         ),)
     )
+    favorites_count = models.PositiveIntegerField(
+        'times favorited',
+        default=0,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'times added to a shopping cart',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False
+    )
     pub_date = models.DateTimeField(
         verbose_name='published',
         auto_now_add=True,
@@ -58,6 +79,12 @@ class Recipe(models.Model):
         ordering = ('-pk',)
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
+        indexes = (
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_popular_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -73,6 +100,7 @@ class RecipeIngredient(models.Model):
         Recipe,
         related_name='recipe',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     amount = models.FloatField(
         validators=(MinValueValidator(
@@ -86,6 +114,12 @@ class RecipeIngredient(models.Model):
         ordering = ('-pk',)
         verbose_name = 'Ingredient for Recipe'
         verbose_name_plural = 'Ingredients for Recipe'
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipes', 'ingredients'),
+                name='unique recipe ingredient'
+            ),
+        )
 
     def __str__(self):
         return f'{self.ingredients.name} - {self.amount}'
@@ -0,0 +1,47 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+from users.models import User
+
+
+class ImageUpload(models.Model):
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    user = models.ForeignKey(
+        User,
+        related_name='image_uploads',
+        on_delete=models.CASCADE,
+    )
+    size = models.PositiveIntegerField(
+        'expected size in bytes'
+    )
+    offset = models.PositiveIntegerField(
+        'bytes received',
+        default=0
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Image upload'
+        verbose_name_plural = 'Image uploads'
+
+    def __str__(self):
+        return f'{self.id} ({self.offset}/{self.size})'
+
+    @property
+    def path(self):
+        return os.path.join(settings.UPLOAD_ROOT, str(self.id))
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
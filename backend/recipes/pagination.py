@@ -0,0 +1,69 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+ESTIMATE_THRESHOLD = 10000
+
+
+def estimate_count(queryset):
+    """
+    The planner's row estimate for an unfiltered PostgreSQL table, or
+    None when an exact COUNT(*) is required or cheap enough.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < ESTIMATE_THRESHOLD:
+        return None
+    return row[0]
+
+
+class EstimatedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None:
+            return super().count
+        return estimate
+
+
+class DefaultResultsSetPagination(PageNumberPagination):
+    """A Custom pagination class."""
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 10
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if request.query_params.get('count') == 'estimated':
+            self.django_paginator_class = EstimatedCountPaginator
+        return super().paginate_queryset(queryset, request, view)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Keyset pagination over the pub_date index, newest first."""
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 10
+    ordering = ('-pub_date', '-id')
+
+
+class PopularCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over recipe_popular_idx, most favourited first."""
+    ordering = ('-favorites_count', '-id')
+
+
+class SubscriptionCursorPagination(RecipeCursorPagination):
+    """Keyset pagination over subscriptions, most recent first."""
+    ordering = ('-subscription_id',)
+
+
+def is_cursor_requested(request):
+    return (request.query_params.get('pagination') == 'cursor'
+            or 'cursor' in request.query_params)
@@ -0,0 +1,150 @@
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import (Case, CharField, F, IntegerField, OuterRef,
+                              Subquery, Value, When)
+from django.db.models.functions import Coalesce
+
+from recipes.models import Recipe, RecipeIngredient
+
+SEARCH_CONFIG = getattr(settings, 'RECIPE_SEARCH_CONFIG', 'russian')
+# Weight of a word found in the name, the ingredients and the text, as
+# the default weights of ts_rank for the A, B and D labels.
+WEIGHTS = {'name': 1.0, 'ingredients': 0.4, 'text': 0.1}
+WORD = re.compile(r'\w+')
+
+_index = None
+
+
+def tokenize(text):
+    return WORD.findall(text.lower())
+
+
+class RecipeIndex:
+    """
+    An in-process inverted index over recipe names, ingredient names and
+    texts, used where PostgreSQL full-text search is not available.
+
+    Every word maps to the recipes containing it and a weighted count of
+    its occurrences. All the words of a query have to match, as with
+    plainto_tsquery.
+    """
+    def __init__(self, recipes):
+        self.words = defaultdict(dict)
+        for pk, fields in recipes:
+            for field, weight in WEIGHTS.items():
+                for word in tokenize(fields.get(field) or ''):
+                    postings = self.words[word]
+                    postings[pk] = postings.get(pk, 0) + weight
+
+    def search(self, query):
+        """Ids of the matching recipes, best first."""
+        words = tokenize(query)
+        if not words:
+            return []
+        scores = None
+        for word in words:
+            postings = self.words.get(word, {})
+            if scores is None:
+                scores = dict(postings)
+            else:
+                scores = {
+                    pk: score + postings[pk]
+                    for pk, score in scores.items() if pk in postings
+                }
+            if not scores:
+                return []
+        return sorted(scores, key=lambda pk: (-scores[pk], -pk))
+
+
+def get_index():
+    global _index
+    if _index is None:
+        recipes = {
+            pk: {'name': name, 'text': text, 'ingredients': ''}
+            for pk, name, text in Recipe.objects.order_by().values_list(
+                'id', 'name', 'text'
+            )
+        }
+        for pk, name in RecipeIngredient.objects.order_by().values_list(
+            'recipes_id', 'ingredients__name'
+        ):
+            recipes[pk]['ingredients'] += f' {name}'
+        _index = RecipeIndex(recipes.items())
+    return _index
+
+
+def reset_index(**kwargs):
+    global _index
+    _index = None
+
+
+def search_vector():
+    from django.contrib.postgres.aggregates import StringAgg
+
+    ingredient_names = Subquery(
+        RecipeIngredient.objects.filter(
+            recipes=OuterRef('pk')
+        ).order_by().values('recipes').annotate(
+            names=StringAgg('ingredients__name', ' ')
+        ).values('names'),
+        output_field=CharField()
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(ingredient_names, Value('')),
+            weight='B',
+            config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='D', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """Rebuild the stored search vectors of the recipes in ``queryset``."""
+    if connection.vendor == 'postgresql':
+        return queryset.update(search_vector=search_vector())
+    reset_index()
+
+
+def search_recipes(queryset, query):
+    """
+    Recipes matching every word of ``query`` in the name, ingredient
+    names or text, the best matches first.
+
+    On PostgreSQL the stored, GIN-indexed search vector is matched and
+    ranked; other databases are served from the in-process index.
+    """
+    if not tokenize(query):
+        return queryset.none()
+    if connection.vendor != 'postgresql':
+        ids = get_index().search(query)
+        if not ids:
+            return queryset.none()
+        return queryset.filter(id__in=ids).order_by(Case(
+            *[When(id=pk, then=Value(position))
+              for position, pk in enumerate(ids)],
+            output_field=IntegerField()
+        ))
+    search_query = SearchQuery(query, config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-search_rank', '-id')
+
+
+def recipe_changed(sender, instance, **kwargs):
+    # Ingredients are saved after the recipe, so wait for the commit.
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(id=instance.id)
+    ))
+
+
+def ingredient_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_search_vectors(
+        Recipe.objects.filter(recipe__ingredients_id=instance.id)
+    ))
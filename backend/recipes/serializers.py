@@ -1,9 +1,12 @@
+from django.db import transaction
 from rest_framework import serializers
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 
-from recipes.fields import Base64ImageField
-from recipes.models import (Cart, Favourite, Ingredient, Recipe,
+from recipes.fields import MAX_IMAGE_SIZE, Base64ImageField
+from recipes.flags import get_flags
+from recipes.images import variant_urls
+from recipes.models import (Cart, Favourite, ImageUpload, Ingredient, Recipe,
                             RecipeIngredient, Tag)
 from users.serializers.subscription import RecipeSubscriptionSerializer
 from users.serializers.user import CustomUserSerializer
@@ -36,35 +39,38 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class FavouriteSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Favourite
-        fields = '__all__'
-
-    def to_representation(self, obj):
-        recipe = get_object_or_404(Recipe, id=obj.recipe.id)
-        if recipe:
-            return RecipeSubscriptionSerializer(obj.recipe).data
-        return super().to_representation(obj)
-
+class ImageUploadSerializer(serializers.ModelSerializer):
+    token = serializers.UUIDField(source='id', read_only=True)
+    size = serializers.IntegerField(min_value=1, max_value=MAX_IMAGE_SIZE)
 
-class CartSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Cart
-        fields = '__all__'
+        model = ImageUpload
+        fields = (
+            'token',
+            'size',
+            'offset',
+        )
+        read_only_fields = ('offset',)
 
-    def to_representation(self, obj):
-        recipe = get_object_or_404(Recipe, id=obj.id)
-        if recipe:
-            return RecipeSubscriptionSerializer(obj).data
-        return super().to_representation(obj)
+
+class RecipeIdsSerializer(serializers.Serializer):
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100
+    )
 
 
 class IngredientForRecipeSerializer(serializers.ModelSerializer):
-    amount = serializers.SerializerMethodField('get_amount')
+    id = serializers.IntegerField(source='ingredients.id', read_only=True)
+    name = serializers.CharField(source='ingredients.name', read_only=True)
+    measurement_unit = serializers.CharField(
+        source='ingredients.measurement_unit',
+        read_only=True
+    )
 
     class Meta:
-        model = Ingredient
+        model = RecipeIngredient
         fields = (
             'id',
             'name',
@@ -72,14 +78,6 @@ class IngredientForRecipeSerializer(serializers.ModelSerializer):
             'amount',
         )
 
-    def get_amount(self, obj):
-        try:
-            return RecipeIngredient.objects.filter(
-                ingredients=obj
-            ).values_list('amount')[0][0]
-        except Favourite.DoesNotExist:
-            return False
-
 
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     id = serializers.IntegerField(write_only=True)
@@ -95,7 +93,11 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
 
 class RecipeListSerializer(serializers.ModelSerializer):
     author = CustomUserSerializer(read_only=True)
-    ingredients = IngredientForRecipeSerializer(read_only=True, many=True)
+    ingredients = IngredientForRecipeSerializer(
+        source='recipe',
+        read_only=True,
+        many=True
+    )
     tags = TagSerializer(read_only=True, many=True)
     is_favorited = serializers.SerializerMethodField(
         'get_is_favorited'
@@ -103,6 +105,7 @@ class RecipeListSerializer(serializers.ModelSerializer):
     is_in_shopping_cart = serializers.SerializerMethodField(
         'get_is_in_shopping_cart'
     )
+    image_variants = serializers.SerializerMethodField('get_image_variants')
 
     class Meta:
         model = Recipe
@@ -115,31 +118,26 @@ class RecipeListSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
+    def get_image_variants(self, obj):
+        urls = variant_urls(obj)
+        request = self.context.get('request')
+        if urls is None or request is None:
+            return urls
+        return {
+            variant: request.build_absolute_uri(url)
+            for variant, url in urls.items()
+        }
+
     def get_is_favorited(self, obj):
-        try:
-            if self.context.get('request').user.is_anonymous:
-                return False
-            return Favourite.objects.filter(
-                recipe=obj,
-                user=self.context.get('request').user
-            ).exists()
-        except Favourite.DoesNotExist:
-            return False
+        return get_flags(self.context.get('request')).has('favorites', obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        try:
-            if self.context.get('request').user.is_anonymous:
-                return False
-            return Cart.objects.filter(
-                recipes=obj,
-                user=self.context.get('request').user
-            ).exists()
-        except Cart.DoesNotExist:
-            return False
+        return get_flags(self.context.get('request')).has('cart', obj.id)
 
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
@@ -147,6 +145,59 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
     ingredients = RecipeIngredientSerializer(many=True)
     cooking_time = serializers.IntegerField()
 
+    def validate_ingredients(self, ingredients_data):
+        ingredient_ids = [item['id'] for item in ingredients_data]
+        if len(set(ingredient_ids)) != len(ingredient_ids):
+            raise serializers.ValidationError(
+                'Ingredients must not repeat.'
+            )
+        ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        missing = set(ingredient_ids) - set(ingredients)
+        if missing:
+            raise serializers.ValidationError(
+                f'Ingredients do not exist: {sorted(missing)}.'
+            )
+        return [
+            {'ingredient': ingredients[item['id']], 'amount': item['amount']}
+            for item in ingredients_data
+        ]
+
+    @staticmethod
+    def set_ingredients(recipe, ingredients_data, replace=False):
+        """
+        Write the recipe ingredients with bulk statements.
+
+        When replacing, only the rows whose ingredient was dropped or whose
+        amount changed are touched.
+        """
+        existing = {}
+        if replace:
+            existing = {
+                row.ingredients_id: row
+                for row in RecipeIngredient.objects.filter(recipes=recipe)
+            }
+        to_create = []
+        to_update = []
+        for item in ingredients_data:
+            row = existing.pop(item['ingredient'].id, None)
+            if row is None:
+                to_create.append(RecipeIngredient(
+                    recipes=recipe,
+                    ingredients=item['ingredient'],
+                    amount=item['amount']
+                ))
+            elif row.amount != item['amount']:
+                row.amount = item['amount']
+                to_update.append(row)
+        if existing:
+            RecipeIngredient.objects.filter(
+                id__in=[row.id for row in existing.values()]
+            ).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ('amount',))
+        RecipeIngredient.objects.bulk_create(to_create)
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         ingredients_data = validated_data.pop('ingredients')
@@ -154,37 +205,24 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
 
         recipe = Recipe.objects.create(author=author, **validated_data)
         recipe.tags.set(tags_data)
-        recipe.save()
-
-        for ingredient in ingredients_data:
-            ingredient_dictionary = dict(ingredient)
-            RecipeIngredient.objects.create(
-                recipes=recipe,
-                ingredients=Ingredient.objects.get(
-                    id=ingredient_dictionary.get('id')
-                ),
-                amount=ingredient.get('amount')
-            )
+        self.set_ingredients(recipe, ingredients_data)
+        self.fields['image'].release_upload()
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        ingredients_data = validated_data.pop('ingredients')
-        tags_data = validated_data.pop('tags')
+        # A partial update leaves out the ingredients and tags it keeps.
+        ingredients_data = validated_data.pop('ingredients', None)
+        tags_data = validated_data.pop('tags', None)
         for item in validated_data:
             if Recipe._meta.get_field(item):
                 setattr(instance, item, validated_data[item])
-        RecipeIngredient.objects.filter(recipes=instance).delete()
-        for ingredient in ingredients_data:
-            ingredient_dictionary = dict(ingredient)
-            RecipeIngredient.objects.create(
-                recipes=instance,
-                ingredients=Ingredient.objects.get(
-                    id=ingredient_dictionary.get('id')
-                ),
-                amount=ingredient.get('amount')
-            )
-        instance.tags.set(tags_data)
         instance.save()
+        if tags_data is not None:
+            instance.tags.set(tags_data)
+        if ingredients_data is not None:
+            self.set_ingredients(instance, ingredients_data, replace=True)
+        self.fields['image'].release_upload()
         return instance
 
     class Meta:
@@ -192,7 +230,8 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         exclude = ('id',)
 
     def to_representation(self, obj):
-        recipe = get_object_or_404(Recipe, id=obj.id)
-        if recipe:
-            return RecipeListSerializer(obj, context=self.context).data
-        return super().to_representation(obj)
+        recipe = get_object_or_404(
+            self.context.get('view').get_queryset(),
+            id=obj.id
+        )
+        return RecipeListSerializer(recipe, context=self.context).data
@@ -0,0 +1,113 @@
+import csv
+import logging
+import os
+
+from django.conf import settings
+from django.db.models import Sum
+
+from recipes.models import Cart, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+PDF_FONT_NAME = 'ShoppingCartFont'
+PDF_LINES_PER_PAGE = 50
+
+
+def get_shopping_list(user):
+    """
+    Ingredients from the user's shopping cart, summed per ingredient
+    and measurement unit by the database.
+    """
+    return RecipeIngredient.objects.filter(
+        recipes__in=Cart.objects.filter(user=user).values('recipes')
+    ).values(
+        'ingredients__name',
+        'ingredients__measurement_unit',
+    ).annotate(
+        total=Sum('amount')
+    ).order_by(
+        'ingredients__name',
+        'ingredients__measurement_unit',
+    ).values_list(
+        'ingredients__name',
+        'ingredients__measurement_unit',
+        'total',
+    )
+
+
+def format_amount(amount):
+    return f'{round(amount, 3):g}'
+
+
+def render_text(shopping_list):
+    for name, unit, total in shopping_list.iterator():
+        yield f'{name}({unit}) - {format_amount(total)}\n'
+
+
+class Echo:
+    """A file-like object that hands back what was written to it."""
+    def write(self, value):
+        return value
+
+
+def render_csv(shopping_list):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for name, unit, total in shopping_list.iterator():
+        yield writer.writerow((name, unit, format_amount(total)))
+
+
+def render_pdf(shopping_list):
+    """
+    A PDF document is only valid once it is complete, so unlike the other
+    renderers this one builds the whole file before handing it out.
+
+    The text is set in the TTF font at SHOPPING_CART_PDF_FONT, DejaVuSans
+    by default, as the built-in Helvetica has no Cyrillic glyphs. Without
+    the font file Helvetica is used, and a warning logged.
+    """
+    from io import BytesIO
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font_name = 'Helvetica'
+    font_path = getattr(settings, 'SHOPPING_CART_PDF_FONT', None)
+    if PDF_FONT_NAME in pdfmetrics.getRegisteredFontNames():
+        font_name = PDF_FONT_NAME
+    elif font_path and os.path.isfile(font_path):
+        pdfmetrics.registerFont(TTFont(PDF_FONT_NAME, font_path))
+        font_name = PDF_FONT_NAME
+    else:
+        logger.warning(
+            'Shopping list PDF font %r not found, Cyrillic ingredient '
+            'names will not render.', font_path
+        )
+
+    buffer = BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    line_height = (height - 100) / PDF_LINES_PER_PAGE
+    text = None
+    for number, line in enumerate(render_text(shopping_list)):
+        if number % PDF_LINES_PER_PAGE == 0:
+            if text is not None:
+                document.drawText(text)
+                document.showPage()
+            text = document.beginText(50, height - 50)
+            text.setFont(font_name, 12)
+            text.setLeading(line_height)
+        text.textLine(line.rstrip('\n'))
+    if text is not None:
+        document.drawText(text)
+    document.save()
+    yield buffer.getvalue()
+
+
+RENDERERS = {
+    'txt': (render_text, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+    'pdf': (render_pdf, 'application/pdf'),
+}
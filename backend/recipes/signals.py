@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from recipes.autocomplete import reset_trie
+from recipes.cache import invalidate_reference_cache
+from recipes.counters import COUNTERS, count_created, count_deleted
+from recipes.feed import (recipe_created, subscription_created,
+                          subscription_deleted)
+from recipes.flags import MODEL_FLAGS, flag_created, flag_deleted
+from recipes.fragments import author_changed, invalidate_recipe
+from recipes.images import schedule_variants
+from recipes.models import ImageUpload, Ingredient, Recipe, Tag
+from recipes.search import ingredient_changed, recipe_changed
+from recipes.uploads import remove_upload_file
+from users.models import Subscription, User
+
+post_save.connect(reset_trie, sender=Ingredient)
+post_delete.connect(reset_trie, sender=Ingredient)
+
+post_delete.connect(remove_upload_file, sender=ImageUpload)
+
+for model in COUNTERS:
+    post_save.connect(count_created, sender=model)
+    post_delete.connect(count_deleted, sender=model)
+
+for model in MODEL_FLAGS:
+    post_save.connect(flag_created, sender=model)
+    post_delete.connect(flag_deleted, sender=model)
+
+for model in (Ingredient, Tag):
+    post_save.connect(invalidate_reference_cache, sender=model)
+    post_delete.connect(invalidate_reference_cache, sender=model)
+
+
+def resize_recipe_image(sender, instance, **kwargs):
+    image_name = instance.image.name
+    if image_name and image_name != instance.image_variants:
+        transaction.on_commit(
+            lambda: schedule_variants(instance.id, image_name)
+        )
+
+
+post_save.connect(resize_recipe_image, sender=Recipe)
+
+post_save.connect(recipe_created, sender=Recipe)
+post_save.connect(subscription_created, sender=Subscription)
+post_delete.connect(subscription_deleted, sender=Subscription)
+
+post_save.connect(recipe_changed, sender=Recipe)
+post_delete.connect(recipe_changed, sender=Recipe)
+post_save.connect(ingredient_changed, sender=Ingredient)
+
+post_save.connect(invalidate_recipe, sender=Recipe)
+post_delete.connect(invalidate_recipe, sender=Recipe)
+post_save.connect(author_changed, sender=User)
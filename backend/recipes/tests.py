@@ -0,0 +1,1113 @@
+import base64
+import csv
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+import msgpack
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from backend.metrics import Registry
+from backend.parsers import MessagePackParser, ORJSONParser
+from backend.renderers import MessagePackRenderer, ORJSONRenderer
+from recipes.autocomplete import SEARCH_LIMIT, reset_trie
+from recipes.fields import (DECODE_CHUNK, HEADER_CHUNKS, MAX_IMAGE_SIDE,
+                            Base64ImageField)
+from recipes.feed import pull_authors
+from recipes.flags import flags_key, get_version, load_ids
+from recipes.models import (Cart, Favourite, FeedEntry, ImageUpload,
+                            Ingredient, Recipe, RecipeIngredient, Tag)
+from recipes.serializers import RecipeWriteSerializer
+from recipes.uploads import append_chunk, save_file
+from users.authentication import CachedTokenAuthentication, snapshots
+from users.models import Subscription, User
+
+RECIPES = 12
+INGREDIENTS_PER_RECIPE = 10
+PAGE_SIZES = (3, 10)
+
+
+def make_png():
+    image_file = BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(image_file, 'PNG')
+    return image_file.getvalue()
+
+
+class RecipeDataMixin:
+    """Recipes by several authors, with tags, ingredients and flags."""
+    @classmethod
+    def create_recipes(cls):
+        cls.users = [
+            User.objects.create_user(
+                f'user{index}@example.com', f'user{index}', 'password'
+            )
+            for index in range(3)
+        ]
+        cls.user = cls.users[0]
+        cls.token = Token.objects.create(user=cls.user)
+        cls.tags = [
+            Tag.objects.create(name=f'tag{index}', color='#FF0000',
+                               slug=f'tag{index}')
+            for index in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'ingredient{index}',
+                                      measurement_unit='g')
+            for index in range(RECIPES + INGREDIENTS_PER_RECIPE)
+        ]
+        image = default_storage.save(
+            'recipes/image.png', ContentFile(make_png())
+        )
+        cls.recipes = []
+        for index in range(RECIPES):
+            recipe = Recipe.objects.create(
+                author=cls.users[index % len(cls.users)],
+                name=f'recipe{index}',
+                text='text',
+                cooking_time=5,
+                image=image
+            )
+            recipe.tags.set(cls.tags[:index % len(cls.tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(
+                    recipes=recipe,
+                    ingredients=cls.ingredients[index + offset],
+                    amount=offset + 1
+                )
+                for offset in range(INGREDIENTS_PER_RECIPE)
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[::2]:
+            Favourite.objects.create(user=cls.user, recipe=recipe)
+            Cart.objects.create(user=cls.user, recipes=recipe)
+        for author in cls.users[1:]:
+            Subscription.objects.create(user=author, subscribed=cls.user)
+
+    def setUp(self):
+        super().setUp()
+        # Every request starts with cold caches, as budgets assume.
+        cache.clear()
+        snapshots.items.clear()
+
+    def authenticate(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+
+class RecipeQueryCountTests(RecipeDataMixin, APITestCase):
+    """
+    The recipe list and detail make the same number of queries whatever
+    the page size, with cold caches.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+
+    def assert_list_queries(self, queries):
+        for page_size in PAGE_SIZES:
+            with self.subTest(page_size=page_size):
+                cache.clear()
+                snapshots.items.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(
+                        reverse('recipe_api-list'), {'limit': page_size}
+                    )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), page_size)
+
+    def assert_detail_queries(self, queries):
+        recipe = self.recipes[-1]
+        with self.assertNumQueries(queries):
+            response = self.client.get(
+                reverse('recipe_api-detail', args=(recipe.id,))
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.data['ingredients']), INGREDIENTS_PER_RECIPE
+        )
+
+    def test_list_anonymous(self):
+        # Count, page of ids, recipes with authors, tags, ingredients.
+        self.assert_list_queries(5)
+
+    def test_list_authenticated(self):
+        # The token, and the favourites, cart and subscriptions of the
+        # user on top.
+        self.authenticate()
+        self.assert_list_queries(9)
+
+    def test_detail_anonymous(self):
+        self.assert_detail_queries(3)
+
+    def test_detail_authenticated(self):
+        self.authenticate()
+        self.assert_detail_queries(7)
+
+    def test_flags(self):
+        self.authenticate()
+        response = self.client.get(reverse('recipe_api-list'))
+        flags = {
+            recipe['id']: (recipe['is_favorited'],
+                           recipe['is_in_shopping_cart'],
+                           recipe['author']['is_subscribed'])
+            for recipe in response.data['results']
+        }
+        for recipe in self.recipes[-10:]:
+            flagged = recipe in self.recipes[::2]
+            self.assertEqual(flags[recipe.id], (
+                flagged, flagged, recipe.author != self.user
+            ))
+
+
+def image_data_uri():
+    return 'data:image/png;base64,' + base64.b64encode(make_png()).decode()
+
+
+class ReferenceCacheTests(APITransactionTestCase):
+    """Conditional requests to the tag and ingredient endpoints."""
+    def setUp(self):
+        cache.clear()
+        self.tag = Tag.objects.create(name='tag', color='#FF0000',
+                                      slug='tag')
+        self.ingredient = Ingredient.objects.create(name='ingredient',
+                                                    measurement_unit='g')
+
+    def assert_revalidated(self, url, edit):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag, modified = response['ETag'], response['Last-Modified']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 304)
+
+        edit()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(response['Last-Modified'], modified)
+        return response
+
+    def test_tag_edited(self):
+        def edit():
+            self.tag.name = 'renamed'
+            self.tag.save()
+        for url in (reverse('tag_api-list'),
+                    reverse('tag_api-detail', args=(self.tag.id,))):
+            with self.subTest(url=url):
+                response = self.assert_revalidated(url, edit)
+                self.assertIn('renamed', str(response.data))
+
+    def test_ingredient_edited(self):
+        def edit():
+            self.ingredient.measurement_unit = 'kg'
+            self.ingredient.save()
+        for url in (reverse('ingredient_api-list'),
+                    reverse('ingredient_api-detail',
+                            args=(self.ingredient.id,))):
+            with self.subTest(url=url):
+                response = self.assert_revalidated(url, edit)
+                self.assertIn('kg', str(response.data))
+
+
+class IngredientSearchTests(APITestCase):
+    NAMES = (
+        'абрикосовый сок', 'сок лимонный', 'сокол', 'персик', 'морковный сок',
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in cls.NAMES
+        )
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'соль {index:02}', measurement_unit='г')
+            for index in range(SEARCH_LIMIT + 5)
+        )
+
+    def setUp(self):
+        cache.clear()
+        reset_trie()
+
+    def search(self, name):
+        response = self.client.get(reverse('ingredient_api-list'),
+                                   {'name': name})
+        self.assertEqual(response.status_code, 200)
+        return [ingredient['name'] for ingredient in response.data]
+
+    def test_prefix_matches_first_trie(self):
+        # Names starting with the query, then names with a word starting
+        # with it, each in name order.
+        self.assertEqual(self.search('Сок'), [
+            'сок лимонный', 'сокол', 'абрикосовый сок', 'морковный сок',
+        ])
+
+    def test_prefix_matches_first_database(self):
+        # Names starting with the query, then names containing it.
+        with mock.patch('recipes.autocomplete.connection') as connection:
+            connection.vendor = 'postgresql'
+            names = self.search('сок')
+        self.assertEqual(names, [
+            'сок лимонный', 'сокол', 'абрикосовый сок', 'морковный сок',
+        ])
+
+    def test_limit_is_a_page(self):
+        for vendor in ('sqlite', 'postgresql'):
+            with self.subTest(vendor=vendor), mock.patch(
+                    'recipes.autocomplete.connection') as connection:
+                connection.vendor = vendor
+                names = self.search('соль')
+            self.assertEqual(len(names), SEARCH_LIMIT)
+            self.assertEqual(names, sorted(names))
+            self.assertEqual(names[0], 'соль 00')
+
+
+class SubscriptionsTests(RecipeDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+
+    def get_subscriptions(self, **params):
+        self.authenticate()
+        return self.client.get(reverse('user-get-subscriptions'), params)
+
+    def newest_recipes(self, author):
+        return list(Recipe.objects.filter(
+            author=author
+        ).order_by('-id').values_list('id', flat=True))
+
+    def test_recipes_limit(self):
+        for recipes_limit in (None, 0, 2, 100):
+            params = {}
+            if recipes_limit is not None:
+                params['recipes_limit'] = recipes_limit
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.get_subscriptions(**params)
+                self.assertEqual(response.status_code, 200)
+                authors = response.data['results']
+                self.assertEqual(
+                    [author['id'] for author in authors],
+                    [user.id for user in self.users[:0:-1]]
+                )
+                for author in authors:
+                    newest = self.newest_recipes(author['id'])
+                    self.assertEqual(author['recipes_count'], len(newest))
+                    self.assertEqual(
+                        [recipe['id'] for recipe in author['recipes']],
+                        newest[:recipes_limit]
+                    )
+                    self.assertTrue(author['is_subscribed'])
+
+    def test_invalid_recipes_limit(self):
+        for recipes_limit in ('-1', 'two', '1.5'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.get_subscriptions(recipes_limit=recipes_limit)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.data)
+
+
+class RecipeSearchTests(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create_user(
+            'author@example.com', 'author', 'password'
+        )
+        image = default_storage.save(
+            'recipes/image.png', ContentFile(make_png())
+        )
+        self.beet = Ingredient.objects.create(name='Свекла для борща',
+                                              measurement_unit='г')
+
+        def create(name, text, ingredient=None):
+            recipe = Recipe.objects.create(
+                author=author, name=name, text=text, cooking_time=5,
+                image=image
+            )
+            if ingredient is not None:
+                RecipeIngredient.objects.create(
+                    recipes=recipe, ingredients=ingredient, amount=1
+                )
+            return recipe
+        # Created worst match first, so the ids do not give the order.
+        self.in_text = create('Суп', 'Подавать как борща')
+        self.in_ingredients = create('Салат', 'Нарезать', self.beet)
+        self.in_name = create('Щи и борща', 'Варить')
+        create('Каша', 'Варить')
+
+    def search(self, query):
+        response = self.client.get(reverse('recipe_api-list'),
+                                   {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['id'] for recipe in response.data['results']]
+
+    def test_name_ranks_above_ingredients_and_text(self):
+        self.assertEqual(self.search('борща'), [
+            self.in_name.id, self.in_ingredients.id, self.in_text.id,
+        ])
+        # Every word of the query must match.
+        self.assertEqual(self.search('борща щи'), [self.in_name.id])
+        self.assertEqual(self.search('пельмени'), [])
+
+    def test_index_follows_edits(self):
+        self.in_text.name = 'Борща'
+        self.in_text.save()
+        self.beet.name = 'Свекла'
+        self.beet.save()
+        self.assertEqual(self.search('борща'), [
+            self.in_text.id, self.in_name.id,
+        ])
+        self.assertEqual(self.search('свекла'), [self.in_ingredients.id])
+        self.in_name.delete()
+        self.assertEqual(self.search('щи'), [])
+
+
+class RecipeCursorTests(RecipeDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+        for count, recipe in enumerate(cls.recipes[::-1]):
+            Recipe.objects.filter(id=recipe.id).update(
+                favorites_count=count % 5
+            )
+
+    def test_popular_ordering(self):
+        expected = list(Recipe.objects.order_by(
+            '-favorites_count', '-id'
+        ).values_list('id', flat=True))
+        ids = []
+        url = reverse('recipe_api-list')
+        params = {'pagination': 'cursor', 'ordering': 'popular', 'limit': 5}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(recipe['id'] for recipe in response.data['results'])
+            url, params = response.data['next'], None
+        self.assertEqual(ids, expected)
+
+    def test_search_refused(self):
+        response = self.client.get(
+            reverse('recipe_api-list'),
+            {'pagination': 'cursor', 'search': 'recipe'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class FormatTests(RecipeDataMixin, APITestCase):
+    """The orjson and MessagePack renderers and parsers."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+
+    def recipe_data(self, image):
+        return {
+            'name': 'рецепт\u2028дня',
+            'text': 'text',
+            'cooking_time': 10,
+            'image': image,
+            'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1.5}],
+        }
+
+    def test_renderers_match_drf_json(self):
+        data = {
+            'created': datetime(2021, 10, 1, 12, 30, tzinfo=timezone.utc),
+            'token': uuid.UUID(int=1),
+            'amount': Decimal('1.50'),
+            'label': gettext_lazy('label'),
+            'line': 'a\u2028b',
+            1: [None, True, 0.5],
+        }
+        expected = JSONRenderer().render(data)
+        rendered = ORJSONRenderer().render(data)
+        self.assertEqual(json.loads(rendered), json.loads(expected))
+        self.assertNotIn('\u2028'.encode(), rendered)
+        # MessagePack keeps the integer key.
+        expected = json.loads(expected)
+        expected[1] = expected.pop('1')
+        self.assertEqual(msgpack.unpackb(
+            MessagePackRenderer().render(data), strict_map_key=False
+        ), expected)
+
+    def test_json_round_trip(self):
+        self.authenticate()
+        response = self.client.post(
+            reverse('recipe_api-list'),
+            ORJSONRenderer().render(self.recipe_data(image_data_uri())),
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        data = ORJSONParser().parse(BytesIO(response.content))
+        self.assertEqual(data['name'], 'рецепт\u2028дня')
+        self.assertEqual(data['ingredients'][0]['amount'], 1.5)
+
+    def test_msgpack_round_trip_with_image_bytes(self):
+        self.authenticate()
+        image = make_png()
+        response = self.client.post(
+            reverse('recipe_api-list'),
+            msgpack.packb(self.recipe_data(image)),
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        data = MessagePackParser().parse(BytesIO(response.content))
+        self.assertEqual(data['name'], 'рецепт\u2028дня')
+        recipe = Recipe.objects.get(id=data['id'])
+        with recipe.image.open() as image_file:
+            self.assertEqual(image_file.read(), image)
+
+    def test_malformed_bodies(self):
+        self.authenticate()
+        for content_type in ('application/json', 'application/msgpack'):
+            with self.subTest(content_type=content_type):
+                response = self.client.post(
+                    reverse('recipe_api-list'), b'\xc1{',
+                    content_type=content_type
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class Base64ImageFieldTests(SimpleTestCase):
+    def test_too_many_pixels_rejected_from_header(self):
+        # Noise does not compress, so the payload spans many chunks.
+        size = (MAX_IMAGE_SIDE + 1, 40)
+        image = Image.frombytes('L', size, os.urandom(size[0] * size[1]))
+        image_file = BytesIO()
+        image.save(image_file, 'PNG')
+        data = base64.b64encode(image_file.getvalue()).decode()
+        self.assertGreater(len(data), 3 * HEADER_CHUNKS * DECODE_CHUNK)
+        with mock.patch('recipes.fields.base64.b64decode',
+                        wraps=base64.b64decode) as b64decode:
+            with self.assertRaisesMessage(serializers.ValidationError,
+                                          'pixels'):
+                Base64ImageField().to_internal_value(data)
+        self.assertEqual(b64decode.call_count, HEADER_CHUNKS)
+
+    def test_image_accepted(self):
+        image = Base64ImageField().to_internal_value(image_data_uri())
+        self.assertTrue(image.name.endswith('.png'))
+
+
+class ImageUploadTests(RecipeDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+
+    def setUp(self):
+        super().setUp()
+        self.upload = save_file(
+            self.user, SimpleUploadedFile('image.png', make_png())
+        )
+        self.addCleanup(os.remove, self.upload.path)
+
+    def test_file_not_opened_when_validation_fails(self):
+        serializer = RecipeWriteSerializer(
+            data={
+                'name': 'recipe',
+                'text': 'text',
+                'cooking_time': 10,
+                'image': str(self.upload.id),
+                'tags': [self.tags[0].id],
+                'ingredients': [{'id': 0, 'amount': 1}],
+            },
+            context={'request': mock.Mock(user=self.user)}
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('ingredients', serializer.errors)
+        self.assertIsNone(serializer.fields['image'].upload_file._file)
+
+
+class RecipeWriteTests(RecipeDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+
+    def test_partial_update_keeps_ingredients_and_tags(self):
+        self.authenticate()
+        recipe = self.recipes[0]
+        ingredients = set(RecipeIngredient.objects.filter(
+            recipes=recipe
+        ).values_list('ingredients_id', 'amount'))
+        tags = set(recipe.tags.values_list('id', flat=True))
+        response = self.client.patch(
+            reverse('recipe_api-detail', args=(recipe.id,)),
+            {'name': 'renamed'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.name, 'renamed')
+        self.assertEqual(set(RecipeIngredient.objects.filter(
+            recipes=recipe
+        ).values_list('ingredients_id', 'amount')), ingredients)
+        self.assertEqual(set(recipe.tags.values_list('id', flat=True)), tags)
+
+
+class ChunkedUploadTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+        self.authenticate()
+        self.data = make_png()
+
+    def start(self):
+        response = self.client.post(
+            reverse('upload_api-list'), {'size': len(self.data)},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        return ImageUpload.objects.get(id=response.data['token'])
+
+    def send(self, upload, offset, chunk):
+        return self.client.patch(
+            reverse('upload_api-detail', args=(upload.id,)), chunk,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset)
+        )
+
+    def test_recipe_from_upload_token(self):
+        upload = self.start()
+        half = len(self.data) // 2
+        self.assertEqual(self.send(upload, 0, self.data[:half]).status_code,
+                         200)
+        response = self.send(upload, half, self.data[half:])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Upload-Offset'], str(len(self.data)))
+        response = self.client.post(reverse('recipe_api-list'), {
+            'name': 'uploaded',
+            'text': 'text',
+            'cooking_time': 10,
+            'image': str(upload.id),
+            'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 1}],
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        recipe = Recipe.objects.get(id=response.data['id'])
+        with recipe.image.open() as image_file:
+            self.assertEqual(image_file.read(), self.data)
+        self.assertFalse(ImageUpload.objects.filter(id=upload.id).exists())
+        self.assertFalse(os.path.exists(upload.path))
+
+    def test_chunk_at_a_claimed_offset_not_written(self):
+        # The view checked the offset, then another request appended at
+        # it before this one locked the upload.
+        upload = self.start()
+        stale = ImageUpload.objects.get(id=upload.id)
+        self.assertTrue(append_chunk(upload, BytesIO(self.data[:10])))
+        self.assertFalse(append_chunk(stale, BytesIO(b'x' * 10)))
+        self.assertEqual(stale.offset, 10)
+        with open(upload.path, 'rb') as upload_file:
+            self.assertEqual(upload_file.read(), self.data[:10])
+
+
+class UserFlagsTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+
+    def test_flags_follow_changes(self):
+        self.authenticate()
+        recipe = self.recipes[-1]
+        url = reverse('recipe_api-detail', args=(recipe.id,))
+        self.assertFalse(self.client.get(url).data['is_favorited'])
+        self.client.get(reverse('recipe_api-favorite', args=(recipe.id,)))
+        self.assertTrue(self.client.get(url).data['is_favorited'])
+        self.client.delete(reverse('recipe_api-favorite', args=(recipe.id,)))
+        self.assertFalse(self.client.get(url).data['is_favorited'])
+
+    def test_load_racing_a_change(self):
+        # A load that read the database before a change committed stores
+        # what it read under the version it started with.
+        version = get_version(self.user.id, 'favorites')
+        stale = load_ids(self.user.id, 'favorites').tobytes()
+        Favourite.objects.create(user=self.user, recipe=self.recipes[-1])
+        cache.set(flags_key(self.user.id, 'favorites', version), stale)
+        self.assertIn(
+            self.recipes[-1].id, load_ids(self.user.id, 'favorites')
+        )
+
+
+class FragmentCacheTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+        self.recipe = self.recipes[0]
+        self.url = reverse('recipe_api-detail', args=(self.recipe.id,))
+
+    def get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_recipe_edit(self):
+        self.get()
+        # An update without signals is not seen: the fragment is cached.
+        Recipe.objects.filter(id=self.recipe.id).update(name='unseen')
+        self.assertEqual(self.get()['name'], 'recipe0')
+        self.authenticate()
+        response = self.client.patch(
+            self.url, {'name': 'edited', 'tags': [self.tags[2].id]},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.client.credentials()
+        data = self.get()
+        self.assertEqual(data['name'], 'edited')
+        self.assertEqual([tag['id'] for tag in data['tags']],
+                         [self.tags[2].id])
+
+    def test_author_rename(self):
+        self.get()
+        author = User.objects.get(id=self.recipe.author_id)
+        author.first_name = 'Renamed'
+        author.save()
+        self.assertEqual(self.get()['author']['first_name'], 'Renamed')
+        author.username = 'renamed'
+        author.save(update_fields=('username',))
+        self.assertEqual(self.get()['author']['username'], 'renamed')
+
+    def test_author_rename_through_request_user(self):
+        self.get()
+        user, _ = CachedTokenAuthentication().authenticate_credentials(
+            self.token.key
+        )
+        user.last_name = 'Renamed'
+        user.save()
+        self.assertEqual(self.get()['author']['last_name'], 'Renamed')
+
+
+class ToggleTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+
+    def login(self, user):
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+    def counters(self, recipe):
+        recipe.refresh_from_db()
+        return recipe.favorites_count, recipe.carts_count
+
+    def flags(self, recipe):
+        data = self.client.get(
+            reverse('recipe_api-detail', args=(recipe.id,))
+        ).data
+        return data['is_favorited'], data['is_in_shopping_cart']
+
+    def test_second_user_and_repeated_toggles(self):
+        # The first user has this recipe in favourites and cart already.
+        recipe = self.recipes[0]
+        self.assertEqual(self.counters(recipe), (1, 1))
+        self.login(self.users[1])
+        for _ in range(2):
+            response = self.client.get(
+                reverse('recipe_api-favorite', args=(recipe.id,))
+            )
+            self.assertEqual(response.status_code, 201)
+            response = self.client.get(
+                reverse('recipe_api-add-to-shopping-cart', args=(recipe.id,))
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.counters(recipe), (2, 2))
+            self.assertEqual(self.flags(recipe), (True, True))
+        for _ in range(2):
+            response = self.client.delete(
+                reverse('recipe_api-favorite', args=(recipe.id,))
+            )
+            self.assertEqual(response.status_code, 204)
+            response = self.client.delete(
+                reverse('recipe_api-add-to-shopping-cart', args=(recipe.id,))
+            )
+            self.assertEqual(response.status_code, 204)
+            self.assertEqual(self.counters(recipe), (1, 1))
+            self.assertEqual(self.flags(recipe), (False, False))
+        self.assertTrue(Favourite.objects.filter(
+            user=self.user, recipe=recipe
+        ).exists())
+
+    def test_batch_toggles(self):
+        self.login(self.users[1])
+        # Half of the recipes are in the first user's lists already.
+        recipes = self.recipes[:4]
+        before = {recipe.id: self.counters(recipe) for recipe in recipes}
+        data = {'recipes': [recipe.id for recipe in recipes]}
+        for name in ('recipe_api-favorite-batch',
+                     'recipe_api-shopping-cart-batch'):
+            for _ in range(2):
+                response = self.client.post(reverse(name), data,
+                                            format='json')
+                self.assertEqual(response.status_code, 201)
+        for recipe in recipes:
+            favorites, carts = before[recipe.id]
+            self.assertEqual(self.counters(recipe), (favorites + 1, carts + 1))
+            self.assertEqual(self.flags(recipe), (True, True))
+        for name in ('recipe_api-favorite-batch',
+                     'recipe_api-shopping-cart-batch'):
+            response = self.client.delete(reverse(name), data, format='json')
+            self.assertEqual(response.status_code, 204)
+        for recipe in recipes:
+            self.assertEqual(self.counters(recipe), before[recipe.id])
+            self.assertEqual(self.flags(recipe), (False, False))
+
+    def test_batch_with_missing_recipe(self):
+        self.login(self.users[1])
+        response = self.client.post(
+            reverse('recipe_api-favorite-batch'),
+            {'recipes': [self.recipes[0].id, 10 ** 6]}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Favourite.objects.filter(user=self.users[1]).exists())
+
+
+class CounterTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+
+    def counters(self):
+        return dict(Recipe.objects.values_list(
+            'id', 'favorites_count'
+        )), dict(Recipe.objects.values_list('id', 'carts_count'))
+
+    def expected(self):
+        return tuple(
+            {recipe.id: model.objects.filter(**{field: recipe}).count()
+             for recipe in self.recipes}
+            for model, field in ((Favourite, 'recipe'), (Cart, 'recipes'))
+        )
+
+    def test_counters_follow_changes(self):
+        self.assertEqual(self.counters(), self.expected())
+        self.authenticate()
+        recipe = self.recipes[1]
+        self.client.get(reverse('recipe_api-favorite', args=(recipe.id,)))
+        self.client.get(
+            reverse('recipe_api-add-to-shopping-cart', args=(recipe.id,))
+        )
+        Favourite.objects.create(user=self.users[1], recipe=recipe)
+        self.assertEqual(self.counters(), self.expected())
+        self.client.delete(reverse('recipe_api-favorite', args=(recipe.id,)))
+        Cart.objects.filter(user=self.user, recipes=self.recipes[0]).delete()
+        self.assertEqual(self.counters(), self.expected())
+        # Deleting a user deletes their favourites and cart with it.
+        self.user.delete()
+        self.assertEqual(self.counters(), self.expected())
+        self.assertEqual(Recipe.objects.get(id=recipe.id).favorites_count, 1)
+
+    def test_recount_repairs_counters(self):
+        Recipe.objects.filter(id=self.recipes[0].id).update(
+            favorites_count=100, carts_count=0
+        )
+        Recipe.objects.filter(id=self.recipes[1].id).update(
+            favorites_count=5
+        )
+        self.assertNotEqual(self.counters(), self.expected())
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.counters(), self.expected())
+
+
+class TokenAuthenticationTests(APITransactionTestCase):
+    """Cached tokens stop working as soon as they are revoked."""
+    def setUp(self):
+        cache.clear()
+        snapshots.items.clear()
+        self.user = User.objects.create_user(
+            'user@example.com', 'user', 'password'
+        )
+
+    def login(self):
+        response = self.client.post(
+            reverse('login'),
+            {'email': 'user@example.com', 'password': 'password'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {response.data["auth_token"]}'
+        )
+
+    def assert_authenticated(self, authenticated=True):
+        # Twice: loaded on the first request, cached for the second.
+        for _ in range(2):
+            response = self.client.get(reverse('user-me'))
+            self.assertEqual(response.status_code,
+                             200 if authenticated else 401)
+
+    def test_logout(self):
+        self.login()
+        self.assert_authenticated()
+        response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, 204)
+        self.assert_authenticated(False)
+
+    def test_token_deleted(self):
+        self.login()
+        self.assert_authenticated()
+        Token.objects.filter(user=self.user).delete()
+        self.assert_authenticated(False)
+
+    def test_user_deactivated(self):
+        self.login()
+        self.assert_authenticated()
+        self.user.is_active = False
+        self.user.save()
+        self.assert_authenticated(False)
+
+
+class FeedTests(RecipeDataMixin, APITransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+
+    def test_followers_count(self):
+        author = self.users[1]
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 1)
+        Subscription.objects.create(user=author, subscribed=self.users[2])
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 2)
+        Subscription.objects.filter(user=author).delete()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 0)
+
+    def test_request_user_save_keeps_followers_count(self):
+        author = self.users[1]
+        token = Token.objects.create(user=author)
+        authentication = CachedTokenAuthentication()
+        # The first request loads the user, the next one its snapshot.
+        for _ in range(2):
+            user, _ = authentication.authenticate_credentials(token.key)
+            Subscription.objects.create(user=author, subscribed=self.users[2])
+            user.first_name = 'renamed'
+            user.save()
+            author.refresh_from_db()
+            self.assertEqual(author.first_name, 'renamed')
+            self.assertEqual(author.followers_count, 2)
+            Subscription.objects.filter(subscribed=self.users[2]).delete()
+        # A deliberate save of the field is kept.
+        author.followers_count = 5
+        author.save()
+        author.refresh_from_db()
+        self.assertEqual(author.followers_count, 5)
+
+    def test_fan_out_trims_feeds(self):
+        follower = self.users[2]
+        Subscription.objects.create(user=self.users[1], subscribed=follower)
+        with mock.patch('recipes.feed.MAX_ENTRIES', 2):
+            Recipe.objects.create(
+                author=self.users[1], name='new', text='text',
+                cooking_time=5, image=self.recipes[0].image.name
+            )
+        newest = Recipe.objects.filter(
+            author=self.users[1]
+        ).order_by('-id').values_list('id', flat=True)[:2]
+        self.assertEqual(list(FeedEntry.objects.filter(
+            user=follower
+        ).order_by('-recipe_id').values_list('recipe_id', flat=True)),
+            list(newest))
+
+    def test_pulled_authors(self):
+        self.authenticate()
+        author = self.users[1]
+        with mock.patch('recipes.feed.FANOUT_LIMIT', 0):
+            recipe = Recipe.objects.create(
+                author=author, name='pulled', text='text', cooking_time=5,
+                image=self.recipes[0].image.name
+            )
+            self.assertFalse(FeedEntry.objects.filter(recipe=recipe).exists())
+            cache.clear()
+            with self.assertNumQueries(1):
+                self.assertIn(author.id, pull_authors())
+            response = self.client.get(reverse('recipe_api-feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], recipe.id)
+
+
+class ShoppingCartTests(RecipeDataMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_recipes()
+        Ingredient.objects.filter(id=cls.ingredients[0].id).update(
+            name='Абрикосы'
+        )
+
+    def download(self, file_format):
+        response = self.client.get(
+            reverse('recipe_api-download-shopping-cart'),
+            {'file_format': file_format}
+        )
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_amounts_summed_across_recipes(self):
+        # Both recipes have ingredient1: 2 g in the first, 1 g in the
+        # second.
+        user = self.users[1]
+        for recipe in self.recipes[:2]:
+            Cart.objects.create(user=user, recipes=recipe)
+        token = Token.objects.create(user=user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        lines = self.download('txt').splitlines()
+        self.assertEqual(len(lines), INGREDIENTS_PER_RECIPE + 1)
+        self.assertIn('ingredient1(g) - 3', lines)
+        self.assertIn('Абрикосы(g) - 1', lines)
+        self.assertIn('ingredient10(g) - 10', lines)
+
+        rows = list(csv.reader(self.download('csv').splitlines()))
+        self.assertEqual(rows[0], ['name', 'measurement_unit', 'amount'])
+        self.assertEqual(len(rows), INGREDIENTS_PER_RECIPE + 2)
+        self.assertIn(['ingredient1', 'g', '3'], rows)
+        self.assertIn(['Абрикосы', 'g', '1'], rows)
+
+    @skipUnless(os.path.isfile(settings.SHOPPING_CART_PDF_FONT),
+                'The PDF font is not installed')
+    def test_pdf_embeds_cyrillic_font(self):
+        self.authenticate()
+        response = self.client.get(
+            reverse('recipe_api-download-shopping-cart'),
+            {'file_format': 'pdf'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'DejaVuSans', b''.join(response.streaming_content))
+
+
+@override_settings(QUERY_BUDGETS_STRICT=True)
+class QueryBudgetTests(RecipeDataMixin, APITransactionTestCase):
+    """
+    Send a request to every action in QUERY_BUDGETS with cold caches. The
+    instrumentation middleware raises QueryBudgetExceeded for a request
+    over its budget.
+
+    Requests run outside a test transaction, so their atomic blocks and
+    on_commit callbacks run as they do in production.
+    """
+    def setUp(self):
+        super().setUp()
+        self.create_recipes()
+        # New recipes are fanned out to a follower.
+        Subscription.objects.create(user=self.user, subscribed=self.users[1])
+
+    def request(self, method, name, *args, data=None, status=200):
+        cache.clear()
+        snapshots.items.clear()
+        response = getattr(self.client, method)(
+            reverse(name, args=args), data, format='json'
+        )
+        self.assertEqual(
+            response.status_code, status, getattr(response, 'data', None)
+        )
+        return response
+
+    def recipe_data(self, **data):
+        return {
+            'name': 'recipe',
+            'text': 'text',
+            'cooking_time': 10,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 2}
+                for ingredient in self.ingredients[:INGREDIENTS_PER_RECIPE]
+            ],
+            **data,
+        }
+
+    def upload_token(self):
+        upload = save_file(
+            self.user, SimpleUploadedFile('image.png', make_png())
+        )
+        return str(upload.id)
+
+    def send_requests(self):
+        recipe = self.recipes[1]
+        self.request('get', 'recipe_api-list')
+        self.request('get', 'recipe_api-detail', recipe.id)
+        self.request('get', 'tag_api-list')
+        self.request('get', 'tag_api-detail', self.tags[0].id)
+        self.request('get', 'ingredient_api-list', data={'name': 'ingr'})
+        self.request('get', 'ingredient_api-detail', self.ingredients[0].id)
+        self.request('get', 'user-list')
+
+        self.authenticate()
+        self.request('get', 'recipe_api-list')
+        self.request('get', 'recipe_api-detail', recipe.id)
+        self.request('get', 'recipe_api-feed')
+        self.request('get', 'user-get-subscriptions',
+                     data={'recipes_limit': 2})
+        self.request('get', 'recipe_api-favorite', recipe.id, status=201)
+        self.request('delete', 'recipe_api-favorite', recipe.id,
+                     status=204)
+        self.request('get', 'recipe_api-add-to-shopping-cart', recipe.id)
+        upload = self.request(
+            'post', 'upload_api-list', data={'size': 10}, status=201
+        ).data
+        self.request('get', 'upload_api-detail', upload['token'])
+        response = self.client.patch(
+            reverse('upload_api-detail', args=(upload['token'],)),
+            b'0123456789', content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET='0'
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.request('delete', 'upload_api-detail', upload['token'],
+                     status=204)
+        response = self.client.post(
+            reverse('upload_api-list'),
+            {'file': SimpleUploadedFile('image.png', make_png())},
+            format='multipart'
+        )
+        self.assertEqual(response.status_code, 201, response.data)
+        batch = {'recipes': [recipe.id for recipe in self.recipes[1::2]]}
+        for name in ('recipe_api-favorite-batch',
+                     'recipe_api-shopping-cart-batch'):
+            self.request('post', name, data=batch, status=201)
+            self.request('delete', name, data=batch, status=204)
+        self.request('get', 'recipe_api-download-shopping-cart')
+
+        created = self.request(
+            'post', 'recipe_api-list',
+            data=self.recipe_data(image=image_data_uri()), status=201
+        ).data
+        self.request('patch', 'recipe_api-detail', created['id'],
+                     data=self.recipe_data(name='patched'))
+        # Images may also be sent as the token of a finished upload.
+        self.request(
+            'patch', 'recipe_api-detail', created['id'],
+            data=self.recipe_data(image=self.upload_token()),
+        )
+        self.request(
+            'post', 'recipe_api-list',
+            data=self.recipe_data(image=self.upload_token()), status=201
+        )
+        self.request('delete', 'recipe_api-detail', created['id'],
+                     status=204)
+
+    def test_budgets(self):
+        registry = Registry()
+        with mock.patch('backend.metrics.registry', registry):
+            self.send_requests()
+        for budget in settings.QUERY_BUDGETS:
+            method, _, action = budget.rpartition(' ')
+            with self.subTest(budget=budget):
+                self.assertTrue(any(
+                    name == action and method in ('', request_method)
+                    for name, request_method in registry.totals
+                ))
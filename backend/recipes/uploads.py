@@ -0,0 +1,74 @@
+import os
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import ImageUpload
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadOverflow(Exception):
+    """More bytes were sent than the upload announced."""
+
+
+def start_upload(user, size):
+    upload = ImageUpload.objects.create(user=user, size=size)
+    os.makedirs(settings.UPLOAD_ROOT, exist_ok=True)
+    open(upload.path, 'wb').close()
+    return upload
+
+
+def append_chunk(upload, stream):
+    """
+    Copy the stream to the end of the upload file piece by piece, so a
+    worker never holds more than CHUNK_SIZE bytes of it in memory.
+
+    The upload row stays locked while the file is written, so of two
+    requests sent at the same offset the second one sees the offset the
+    first one reached and writes nothing. Returns whether the chunk was
+    appended; either way ``upload.offset`` is the one now stored.
+    """
+    with transaction.atomic():
+        stored = ImageUpload.objects.select_for_update().only(
+            'offset'
+        ).get(id=upload.id)
+        if stored.offset != upload.offset:
+            upload.offset = stored.offset
+            return False
+        with open(upload.path, 'r+b') as upload_file:
+            # Drop whatever a previously interrupted request left behind.
+            upload_file.truncate(upload.offset)
+            upload_file.seek(upload.offset)
+            offset = upload.offset
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                if offset > upload.size:
+                    upload_file.truncate(upload.offset)
+                    raise UploadOverflow
+                upload_file.write(chunk)
+        ImageUpload.objects.filter(id=upload.id).update(offset=offset)
+    upload.offset = offset
+    return True
+
+
+def save_file(user, uploaded_file):
+    upload = start_upload(user, uploaded_file.size)
+    with open(upload.path, 'wb') as upload_file:
+        for chunk in uploaded_file.chunks(CHUNK_SIZE):
+            upload_file.write(chunk)
+    upload.offset = upload.size
+    upload.save(update_fields=('offset',))
+    return upload
+
+
+def remove_upload_file(sender, instance, **kwargs):
+    path = instance.path
+
+    def remove():
+        if os.path.exists(path):
+            os.remove(path)
+    transaction.on_commit(remove)
@@ -1,12 +1,14 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
+from recipes.views import (ImageUploadViewSet, IngredientViewSet,
+                           RecipeViewSet, TagViewSet)
 
 router_v1 = DefaultRouter()
 router_v1.register('tags', TagViewSet, basename='tag_api')
 router_v1.register('ingredients', IngredientViewSet, basename='ingredient_api')
 router_v1.register('recipes', RecipeViewSet, basename='recipe_api')
+router_v1.register('uploads', ImageUploadViewSet, basename='upload_api')
 
 
 urlpatterns = [
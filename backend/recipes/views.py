@@ -1,31 +1,44 @@
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from io import BytesIO
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.parsers import MultiPartParser
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.viewsets import (ModelViewSet, ReadOnlyModelViewSet,
+                                     ViewSet)
 
+from backend.db import ReplicaReadMixin
+from backend.parsers import MessagePackParser, ORJSONParser
+from recipes.cache import CachedReferenceMixin
+from recipes.counters import change_counter, lock_recipes
+from recipes.feed import get_feed_page
+from recipes.fields import MAX_IMAGE_SIZE
+from recipes.flags import MODEL_FLAGS, invalidate_ids
+from recipes.fragments import render_recipes
 from recipes.filters import IngredientsFilter, RecipesFilter
-from recipes.models import (Cart, Favourite, Ingredient, Recipe,
+from recipes.models import (Cart, Favourite, ImageUpload, Ingredient, Recipe,
                             RecipeIngredient, Tag)
+from recipes.pagination import (DefaultResultsSetPagination,
+                                PopularCursorPagination,
+                                RecipeCursorPagination, is_cursor_requested)
 from recipes.permissions import IsAuthorOrAdmin
-from recipes.serializers import (CartSerializer, FavouriteSerializer,
-                                 IngredientSerializer, RecipeListSerializer,
+from recipes.serializers import (ImageUploadSerializer, IngredientSerializer,
+                                 RecipeIdsSerializer, RecipeListSerializer,
                                  RecipeWriteSerializer, TagSerializer)
+from recipes.shopping_cart import RENDERERS, get_shopping_list
+from recipes.uploads import (UploadOverflow, append_chunk, save_file,
+                             start_upload)
 from users.serializers.subscription import RecipeSubscriptionSerializer
 
 
-class DefaultResultsSetPagination(PageNumberPagination):
-    """A Custom pagination class."""
-    page_size = 10
-    page_size_query_param = 'limit'
-    max_page_size = 10
-
-
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CachedReferenceMixin, ReadOnlyModelViewSet):
     """A ViewSet for viewing Tag instances."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
@@ -36,7 +49,7 @@ class TagViewSet(ReadOnlyModelViewSet):
         return Response(data)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(CachedReferenceMixin, ReadOnlyModelViewSet):
     """A ViewSet for viewing Ingredient instances."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
@@ -50,7 +63,81 @@ class IngredientViewSet(ReadOnlyModelViewSet):
         return Response(data)
 
 
-class RecipeViewSet(ModelViewSet):
+class ImageUploadViewSet(ViewSet):
+    """
+    Resumable uploads for recipe images.
+
+    POST either sends the whole file as multipart form data, or announces
+    the size and then sends the bytes in any number of PATCH requests,
+    each one starting at the Upload-Offset the server reports. The
+    returned token is accepted in place of a base64 image.
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = (ORJSONParser, MessagePackParser, MultiPartParser)
+
+    def get_upload(self, pk):
+        try:
+            return ImageUpload.objects.get(id=pk, user=self.request.user)
+        except (ImageUpload.DoesNotExist, ValidationError):
+            raise Http404
+
+    def create(self, request):
+        uploaded_file = request.FILES.get('file')
+        if uploaded_file is not None:
+            if uploaded_file.size > MAX_IMAGE_SIZE:
+                return Response(
+                    {'file': f'The image may not exceed {MAX_IMAGE_SIZE} '
+                             'bytes.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            upload = save_file(request.user, uploaded_file)
+        else:
+            serializer = ImageUploadSerializer(data=request.data)
+            serializer.is_valid(raise_exception=True)
+            upload = start_upload(
+                request.user, serializer.validated_data['size']
+            )
+        return Response(
+            ImageUploadSerializer(upload).data,
+            status=status.HTTP_201_CREATED
+        )
+
+    def retrieve(self, request, pk=None):
+        upload = self.get_upload(pk)
+        response = Response(ImageUploadSerializer(upload).data)
+        response['Upload-Offset'] = upload.offset
+        return response
+
+    def partial_update(self, request, pk=None):
+        upload = self.get_upload(pk)
+        if request.META.get('HTTP_UPLOAD_OFFSET') != str(upload.offset):
+            response = Response(
+                ImageUploadSerializer(upload).data,
+                status=status.HTTP_409_CONFLICT
+            )
+            response['Upload-Offset'] = upload.offset
+            return response
+        try:
+            appended = append_chunk(upload, request.stream or BytesIO())
+        except UploadOverflow:
+            return Response(
+                {'size': f'The upload is limited to {upload.size} bytes.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        response = Response(
+            ImageUploadSerializer(upload).data,
+            status=status.HTTP_200_OK if appended
+            else status.HTTP_409_CONFLICT
+        )
+        response['Upload-Offset'] = upload.offset
+        return response
+
+    def destroy(self, request, pk=None):
+        self.get_upload(pk).delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class RecipeViewSet(ReplicaReadMixin, ModelViewSet):
     """A ViewSet for creating, editing and viewing Recipe instances."""
     queryset = Recipe.objects.all()
     pagination_class = DefaultResultsSetPagination
@@ -66,36 +153,129 @@ class RecipeViewSet(ModelViewSet):
         if self.action in ('list', 'retrieve'):
             self.permission_classes = [AllowAny]
         elif self.action in (
-                'favorite', 'add_to_shopping_cart', 'download_shopping_cart'
+                'favorite', 'favorite_batch',
+                'add_to_shopping_cart', 'shopping_cart_batch',
+                'download_shopping_cart', 'feed'
         ):
             self.permission_classes = [IsAuthenticated]
         return super().get_permissions()
 
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if not is_cursor_requested(self.request):
+                self._paginator = self.pagination_class()
+            elif self.request.query_params.get('ordering') == 'popular':
+                self._paginator = PopularCursorPagination()
+            else:
+                self._paginator = RecipeCursorPagination()
+        return self._paginator
+
+    def get_queryset(self):
+        queryset = Recipe.objects.prefetch_related(
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredients'
+                )
+            ),
+        )
+        return queryset.select_related('author')
+
     def get_serializer_class(self):
         if self.action in ("list", "retrieve"):
             return RecipeListSerializer
         return RecipeWriteSerializer
 
+    def render_recipes(self, recipe_ids):
+        return render_recipes(
+            recipe_ids, self.get_queryset(), self.get_serializer_context()
+        )
+
+    def list(self, request, *args, **kwargs):
+        """
+        Filter and paginate ids only; the recipes of the page are served
+        from the fragment cache.
+        """
+        if ('search' in request.query_params
+                and is_cursor_requested(request)):
+            # A cursor keeps its place by a column, search ranks are not.
+            return Response(
+                {'search': 'Search results are paginated by page number.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        queryset = self.filter_queryset(
+            Recipe.objects.only('id', 'pub_date', 'favorites_count')
+        )
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(self.render_recipes(
+                [recipe.id for recipe in queryset]
+            ))
+        return self.get_paginated_response(self.render_recipes(
+            [recipe.id for recipe in page]
+        ))
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            recipe_id = int(kwargs['pk'])
+        except ValueError:
+            raise Http404
+        data = self.render_recipes([recipe_id])
+        if not data:
+            raise Http404
+        return Response(data[0])
+
     @action(
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request, *args, **kwargs):
-        current_user = request.user
-        recipes_ids = Cart.objects.filter(
-            user=current_user
-        ).values_list('recipes_id', flat=True)
-        ingredients = list(RecipeIngredient.objects.filter(
-            recipes_id__in=recipes_ids
-        ).values_list(
-            'ingredients__name',
-            'ingredients__measurement_unit',
-            'amount',
-        ))
-        shopping_list = [f'{ingredient[0]}({ingredient[1]}) - {ingredient[2]}'
-                         + '\n' for ingredient in ingredients]
-        return HttpResponse(shopping_list, content_type='text/plain')
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in RENDERERS:
+            return Response(
+                {'file_format': f'Choose one of: {", ".join(RENDERERS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        render, content_type = RENDERERS[file_format]
+        response = StreamingHttpResponse(
+            render(get_shopping_list(request.user)),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_format}"'
+        )
+        return response
+
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        Recipes of the followed authors, newest first. The next page is
+        the one ?before the last recipe of the current page.
+        """
+        before = request.query_params.get('before')
+        if before is not None:
+            try:
+                before = int(before)
+            except ValueError:
+                return Response(
+                    {'before': 'Must be a recipe id.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        size = DefaultResultsSetPagination().get_page_size(request)
+        ids, has_more = get_feed_page(request.user, before, size)
+        next_url = None
+        if has_more:
+            next_url = replace_query_param(
+                request.build_absolute_uri(), 'before', ids[-1]
+            )
+        return Response({
+            'next': next_url,
+            'previous': None,
+            'results': self.render_recipes(ids),
+        })
 
     @staticmethod
     def return_resp(serializer):
@@ -106,36 +286,106 @@ class RecipeViewSet(ModelViewSet):
             serializer.errors, status=status.HTTP_400_BAD_REQUEST
         )
 
+    @staticmethod
+    def get_recipes(recipe_ids):
+        return list(Recipe.objects.filter(id__in=recipe_ids).only(
+            'id', 'name', 'image', 'cooking_time'
+        ))
+
+    @transaction.atomic
+    def add_recipes(self, model, field, recipes):
+        """
+        Link the recipes to the current user with a single
+        INSERT ... ON CONFLICT DO NOTHING, so repeated and concurrent
+        requests are harmless. The recipe rows stay locked until the
+        counters are updated, which keeps them exact.
+        """
+        recipe_ids = lock_recipes([recipe.id for recipe in recipes])
+        linked = set(model.objects.filter(
+            user=self.request.user,
+            **{f'{field}_id__in': recipe_ids}
+        ).values_list(f'{field}_id', flat=True))
+        model.objects.bulk_create(
+            [model(user=self.request.user, **{field: recipe})
+             for recipe in recipes if recipe.id not in linked],
+            ignore_conflicts=True
+        )
+        added = [
+            recipe_id for recipe_id in recipe_ids if recipe_id not in linked
+        ]
+        change_counter(model, added, 1)
+        if added:
+            invalidate_ids(self.request.user.id, MODEL_FLAGS[model])
+
+    @transaction.atomic
+    def remove_recipes(self, model, field, recipe_ids):
+        """
+        Unlink the recipes with a single DELETE. Like add_recipes, it
+        updates the counters and flags itself rather than through the
+        post_delete signals, which would make a query per row.
+        """
+        lock_recipes(recipe_ids)
+        linked = model.objects.filter(
+            user=self.request.user,
+            **{f'{field}_id__in': recipe_ids}
+        )
+        removed = list(linked.values_list(f'{field}_id', flat=True))
+        if not removed:
+            return
+        linked._raw_delete(linked.db)
+        change_counter(model, removed, -1)
+        invalidate_ids(self.request.user.id, MODEL_FLAGS[model])
+
+    def toggle_recipe(self, request, pk, model, field, created_status):
+        if request.method == 'DELETE':
+            self.remove_recipes(model, field, [pk])
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        recipes = self.get_recipes([pk])
+        if not recipes:
+            raise Http404
+        self.add_recipes(model, field, recipes)
+        return Response(
+            RecipeSubscriptionSerializer(recipes[0]).data,
+            status=created_status
+        )
+
+    def toggle_recipes(self, request, model, field):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'DELETE':
+            self.remove_recipes(model, field, recipe_ids)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        recipes = self.get_recipes(recipe_ids)
+        missing = set(recipe_ids) - {recipe.id for recipe in recipes}
+        if missing:
+            return Response(
+                {'recipes': f'Recipes do not exist: {sorted(missing)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        self.add_recipes(model, field, recipes)
+        return Response(
+            RecipeSubscriptionSerializer(recipes, many=True).data,
+            status=status.HTTP_201_CREATED
+        )
+
     @action(
         detail=True,
         methods=['get', 'delete'],
         url_path='favorite'
     )
     def favorite(self, request, pk=None):
-        current_user = self.request.user
-        recipe = get_object_or_404(
-            Recipe,
-            id=pk
+        return self.toggle_recipe(
+            request, pk, Favourite, 'recipe', status.HTTP_201_CREATED
         )
 
-        if request.method == 'GET':
-            if Favourite.objects.filter(recipe=recipe).exists():
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            serializer = FavouriteSerializer(
-                required=False,
-                data={'user': current_user.id, 'recipe': recipe.id},
-                context={'request': request}
-            )
-            if serializer.is_valid():
-                serializer.save()
-                return Response(
-                    serializer.data, status=status.HTTP_201_CREATED
-                )
-            return Response(
-                serializer.errors, status=status.HTTP_400_BAD_REQUEST
-            )
-        Favourite.objects.filter(user=current_user, recipe=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite'
+    )
+    def favorite_batch(self, request):
+        return self.toggle_recipes(request, Favourite, 'recipe')
 
     @action(
         detail=True,
@@ -143,22 +393,14 @@ class RecipeViewSet(ModelViewSet):
         url_path='shopping_cart'
     )
     def add_to_shopping_cart(self, request, pk=None):
-        current_user = request.user
-        recipe = get_object_or_404(
-            Recipe,
-            id=pk
+        return self.toggle_recipe(
+            request, pk, Cart, 'recipes', status.HTTP_200_OK
         )
 
-        if request.method == 'GET':
-            if Cart.objects.filter(recipes=recipe).exists():
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            serializer = CartSerializer(
-                many=False,
-                instance=recipe,
-                context={'request': request}
-            )
-            Cart.objects.create(user=current_user, recipes=recipe)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        Cart.objects.filter(user=current_user, recipes=recipe).delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart'
+    )
+    def shopping_cart_batch(self, request):
+        return self.toggle_recipes(request, Cart, 'recipes')
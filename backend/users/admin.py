@@ -10,6 +10,11 @@ class CustomUserAdmin(admin.ModelAdmin):
     list_filter = ('username', 'email')
     empty_value_display = '-empty-'
 
+    def get_queryset(self, request):
+        # Saving a user must not write back a followers_count read before
+        # a subscription changed it.
+        return super().get_queryset(request).defer('followers_count')
+
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
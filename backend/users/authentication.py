@@ -0,0 +1,165 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+# Snapshots live this long in the shared cache, and a few seconds in each
+# process, which is as long as a process may still accept a token that
+# was deleted in another one.
+TOKEN_CACHE_TIMEOUT = getattr(settings, 'AUTH_TOKEN_CACHE_TIMEOUT', 60)
+LOCAL_TIMEOUT = getattr(settings, 'AUTH_TOKEN_LOCAL_TIMEOUT', 5)
+LOCAL_SIZE = getattr(settings, 'AUTH_TOKEN_LOCAL_SIZE', 1024)
+# Changed with the fields a snapshot holds.
+SNAPSHOT_VERSION = 2
+# The password hash is not cached; it is loaded when something reads it.
+# followers_count is only changed with F() updates, so it is left out as
+# well: saving request.user then writes only the fields it loaded, and
+# never an outdated count.
+USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname not in ('password', 'followers_count')
+)
+
+
+class LRUCache:
+    """A small thread-safe LRU cache with a time to live."""
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.timeout, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+snapshots = LRUCache(LOCAL_SIZE, LOCAL_TIMEOUT)
+
+
+def token_cache_key(key):
+    # Tokens are credentials, so they are not used as cache keys as is.
+    return f'auth:token:{SNAPSHOT_VERSION}:' + hashlib.sha256(
+        key.encode()
+    ).hexdigest()
+
+
+def take_snapshot(token):
+    return {
+        'created': token.created,
+        'user': tuple(getattr(token.user, name) for name in USER_FIELDS),
+    }
+
+
+def from_snapshot(key, snapshot):
+    user = User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, snapshot['user'])
+    token = Token.from_db(
+        DEFAULT_DB_ALIAS,
+        ('key', 'user_id', 'created'),
+        (key, user.id, snapshot['created'])
+    )
+    token.user = user
+    return user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication that keeps a snapshot of the token and its user
+    in a per-process LRU cache and in the shared cache, so a known token
+    costs no queries.
+
+    Snapshots are dropped when the token is deleted, as on logout, and
+    when the user is changed or deactivated. Inactive users are never
+    cached.
+    """
+    def load_token(self, key):
+        # Read from the primary: a lagging replica may still hold a token
+        # that was deleted on logout, and it would be cached again.
+        model = self.get_model()
+        try:
+            token = model.objects.using(
+                router.db_for_write(model)
+            ).select_related('user').defer(
+                'user__followers_count'
+            ).get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+        return token.user, token
+
+    def authenticate_credentials(self, key):
+        cache_key = token_cache_key(key)
+        snapshot = snapshots.get(cache_key)
+        if snapshot is None:
+            snapshot = cache.get(cache_key)
+            if snapshot is None:
+                user, token = self.load_token(key)
+                snapshot = take_snapshot(token)
+                cache.set(cache_key, snapshot, TOKEN_CACHE_TIMEOUT)
+                snapshots.set(cache_key, snapshot)
+                return user, token
+            snapshots.set(cache_key, snapshot)
+        return from_snapshot(key, snapshot)
+
+
+def forget_tokens(keys):
+    cache_keys = [token_cache_key(key) for key in keys]
+    cache.delete_many(cache_keys)
+    for cache_key in cache_keys:
+        snapshots.delete(cache_key)
+
+
+def token_changed(sender, instance, **kwargs):
+    key = instance.key
+    transaction.on_commit(lambda: forget_tokens([key]))
+
+
+def user_changed(sender, instance, created, update_fields=None, raw=False,
+                 **kwargs):
+    if created or raw:
+        return
+    # Logging in only updates last_login.
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    keys = list(Token.objects.filter(
+        user=instance
+    ).values_list('key', flat=True))
+    transaction.on_commit(lambda: forget_tokens(keys))
+
+
+def logged_out(sender, request, user, **kwargs):
+    token = getattr(request, 'auth', None)
+    if isinstance(token, Token):
+        forget_tokens([token.key])
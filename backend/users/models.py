@@ -77,6 +77,12 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     staff = models.BooleanField(default=False)
     superuser = models.BooleanField(default=False)
+    followers_count = models.PositiveIntegerField(
+        'followers',
+        default=0,
+        db_index=True,
+        editable=False
+    )
 
     USERNAME_FIELD = 'username'
     REQUIRED_FIELDS = (
@@ -22,9 +22,16 @@ class SubscribeSerializer(CustomUserSerializer):
                   'recipes_count',)
 
     def get_recipes_count(self, obj):
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
         return Recipe.objects.filter(author=obj).count()
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'recipe_previews'):
+            return RecipeSubscriptionSerializer(
+                obj.recipe_previews,
+                many=True
+            ).data
         if 'recipes_limit' in self.context.get('request').query_params:
             recipes_limit = int(self.context.get(
                 'request'
@@ -1,7 +1,8 @@
 from djoser.serializers import UserSerializer
 from rest_framework import serializers
 
-from users.models import Subscription, User
+from recipes.flags import get_flags
+from users.models import User
 
 
 class CustomUserSerializer(UserSerializer):
@@ -19,9 +20,8 @@ class CustomUserSerializer(UserSerializer):
         model = User
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        if user.is_authenticated:
-            return Subscription.objects.filter(
-                user=obj,
-                subscribed=user
-            ).exists()
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return get_flags(self.context.get('request')).has(
+            'subscriptions', obj.id
+        )
@@ -0,0 +1,11 @@
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from rest_framework.authtoken.models import Token
+
+from users.authentication import logged_out, token_changed, user_changed
+from users.models import User
+
+post_save.connect(token_changed, sender=Token)
+post_delete.connect(token_changed, sender=Token)
+post_save.connect(user_changed, sender=User)
+user_logged_out.connect(logged_out)
@@ -1,3 +1,5 @@
+from django.db.models import (BooleanField, Count, F, OuterRef, Prefetch,
+                              Subquery, Value, prefetch_related_objects)
 from djoser.views import UserViewSet
 from rest_framework import status
 from rest_framework.decorators import action
@@ -5,14 +7,38 @@ from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
+from backend.db import ReplicaReadMixin
+from recipes.models import Recipe
+from recipes.pagination import (DefaultResultsSetPagination,
+                                SubscriptionCursorPagination,
+                                is_cursor_requested)
 from recipes.permissions import IsAuthorOrAdmin
-from recipes.views import DefaultResultsSetPagination
 from users.models import Subscription, User
 from users.serializers.subscription import SubscribeSerializer
 from users.serializers.subscription import SubscriptionsSerializer
 
 
-class CustomUserViewSet(UserViewSet):
+def recipe_previews(recipes_limit=None):
+    """
+    Recipes shown under each followed author, newest first.
+
+    The limit is applied per author with a correlated subquery, so the
+    previews for a whole page of authors still come from a single query.
+    """
+    queryset = Recipe.objects.only(
+        'id', 'author_id', 'name', 'image', 'cooking_time'
+    ).order_by('-pk')
+    if recipes_limit is None:
+        return queryset
+    return queryset.filter(id__in=Subquery(
+        Recipe.objects.filter(
+            author_id=OuterRef('author_id')
+        ).order_by('-pk').values('id')[:recipes_limit]
+    ))
+
+
+class CustomUserViewSet(ReplicaReadMixin, UserViewSet):
+    replica_actions = ('list', 'retrieve', 'get_subscriptions')
     pagination_class = DefaultResultsSetPagination
     action_permissions = {
         IsAuthorOrAdmin: ['partial_update', 'destroy', 'create'],
@@ -27,10 +53,35 @@ class CustomUserViewSet(UserViewSet):
     )
     def get_subscriptions(self, request):
         current_user = self.request.user
-        paginator = DefaultResultsSetPagination()
-        subscriptions = Subscription.objects.filter(subscribed=current_user)
+        recipes_limit = request.query_params.get('recipes_limit')
+        if recipes_limit is not None:
+            try:
+                recipes_limit = int(recipes_limit)
+                if recipes_limit < 0:
+                    raise ValueError
+            except ValueError:
+                return Response(
+                    {'recipes_limit': 'Must be a non-negative integer.'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        if is_cursor_requested(request):
+            paginator = SubscriptionCursorPagination()
+        else:
+            paginator = DefaultResultsSetPagination()
+        subscriptions = User.objects.filter(
+            target_user__subscribed=current_user
+        ).annotate(
+            subscription_id=F('target_user__id'),
+            recipes_count=Count('author', distinct=True),
+            is_subscribed=Value(True, output_field=BooleanField()),
+        ).order_by('-subscription_id')
         result_page = paginator.paginate_queryset(subscriptions, request)
-        serializer = SubscriptionsSerializer(
+        prefetch_related_objects(result_page, Prefetch(
+            'author',
+            queryset=recipe_previews(recipes_limit),
+            to_attr='recipe_previews'
+        ))
+        serializer = SubscribeSerializer(
             result_page,
             many=True,
             context={